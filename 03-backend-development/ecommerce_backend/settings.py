@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
+from importlib.util import find_spec
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -46,6 +48,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its total covers the other middleware too
+    'products.instrumentation.ServerTimingMiddleware',
+    'products.metrics.MetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -54,6 +59,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # Last, so profiles cover the view rather than the middleware stack
+    'products.profiling.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'ecommerce_backend.urls'
@@ -79,11 +86,154 @@ WSGI_APPLICATION = 'ecommerce_backend.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Every new SQLite connection runs these PRAGMAs: WAL lets readers work
+# while a writer commits, synchronous=NORMAL is durable enough with WAL and
+# skips an fsync per commit, and the memory map / page cache keep hot
+# pages out of read() calls.
+SQLITE_PRAGMAS = (
+    'PRAGMA synchronous=NORMAL;'
+    'PRAGMA mmap_size=268435456;'  # 256 MB
+    'PRAGMA cache_size=-65536;'  # 64 MB (negative = KiB)
+    'PRAGMA temp_store=MEMORY;'
+)
+SQLITE_TIMEOUT = 20  # Seconds to wait for a lock (busy timeout)
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            'init_command': 'PRAGMA journal_mode=WAL;' + SQLITE_PRAGMAS,
+            'timeout': SQLITE_TIMEOUT,
+            # Take the write lock at BEGIN so concurrent writers queue on the
+            # busy timeout instead of failing to upgrade a read lock
+            'transaction_mode': 'IMMEDIATE',
+        },
+    },
+    # Read-only connection to the same file for catalog reads, see
+    # products.routers.CatalogRouter
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            'init_command': 'PRAGMA query_only=ON;' + SQLITE_PRAGMAS,
+            'timeout': SQLITE_TIMEOUT,
+        },
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+
+DATABASE_ROUTERS = ['products.routers.CatalogRouter']
+
+
+# Caching
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+#
+# The 'products' cache holds API responses and search counts. Pick the
+# backend with PRODUCTS_CACHE_BACKEND=locmem|file|redis. 'redis' needs the
+# redis package and REDIS_URL; without the package a process-local memory
+# cache stands in so development works without a Redis server.
+
+PRODUCTS_CACHE_BACKEND = os.environ.get('PRODUCTS_CACHE_BACKEND', 'locmem')
+
+if PRODUCTS_CACHE_BACKEND == 'redis':
+    try:
+        import redis  # noqa: F401
+    except ImportError:
+        PRODUCTS_CACHE_BACKEND = 'locmem'
+
+if PRODUCTS_CACHE_BACKEND == 'redis':
+    PRODUCTS_CACHE = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('REDIS_URL', 'redis://127.0.0.1:6379/1'),
+    }
+elif PRODUCTS_CACHE_BACKEND == 'file':
+    PRODUCTS_CACHE = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / '.cache' / 'products',
     }
+else:
+    PRODUCTS_CACHE = {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'products',
+    }
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'products': {
+        **PRODUCTS_CACHE,
+        'TIMEOUT': 300,
+    },
+}
+
+PRODUCTS_CACHE_ALIAS = 'products'
+PRODUCTS_RESPONSE_CACHE_TIMEOUT = 300
+PRODUCTS_FACETS_CACHE_TIMEOUT = 300  # 0 disables the facet cache
+
+# Serialize product list/search pages from .values() rows instead of model
+# instances (same JSON output, see FastProductListSerializer)
+PRODUCTS_FAST_LIST_SERIALIZATION = True
+
+# Reviews embedded in product detail; the rest are paginated under
+# /api/products/{id}/reviews/
+PRODUCTS_DETAIL_REVIEW_LIMIT = 5
+
+# Ids accepted by one /api/products/batch/ request
+PRODUCTS_BATCH_MAX_IDS = 250
+
+# Server-Timing headers and a JSON summary log line per request (see
+# products.instrumentation); statements repeated this many times in one
+# request are logged as possible N+1 queries (0 disables the check)
+PRODUCTS_REQUEST_INSTRUMENTATION = True
+PRODUCTS_N_PLUS_ONE_THRESHOLD = 5
+
+# Prometheus metrics at /metrics (see products.metrics). With several
+# worker processes, point PRODUCTS_METRICS_DIR at a directory shared by
+# them so /metrics reports the sum of all workers. Only clients in
+# PRODUCTS_METRICS_ALLOWED_IPS (addresses or CIDR networks, comma separated
+# in the environment variable) may scrape it; empty disables /metrics.
+PRODUCTS_METRICS_DIR = os.environ.get('PRODUCTS_METRICS_DIR') or None
+PRODUCTS_METRICS_FLUSH_INTERVAL = 1.0
+PRODUCTS_METRICS_ALLOWED_IPS = [
+    network.strip()
+    for network in os.environ.get('PRODUCTS_METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',')
+    if network.strip()
+]
+
+# On-demand profiling (see products.profiling): requests carrying an
+# 'X-Profile: <token>' header (the token is not accepted in the URL), plus
+# a random sample of requests, are profiled with cProfile into
+# PRODUCTS_PROFILING_DIR
+PRODUCTS_PROFILING_TOKEN = os.environ.get('PRODUCTS_PROFILING_TOKEN') or None
+PRODUCTS_PROFILING_SAMPLE_RATE = float(os.environ.get('PRODUCTS_PROFILING_SAMPLE_RATE', 0))
+PRODUCTS_PROFILING_DIR = os.environ.get('PRODUCTS_PROFILING_DIR', str(BASE_DIR / 'profiles'))
+
+# Resized WebP/JPEG variants of uploaded images (see products.images).
+# They are generated inline when the upload is committed unless
+# PRODUCTS_IMAGE_WORKERS is set to the size of a process pool to run them in;
+# the pool is off by default and must be enabled explicitly
+PRODUCTS_IMAGE_VARIANT_WIDTHS = (160, 320, 640, 1280)
+PRODUCTS_IMAGE_VARIANT_FORMATS = ('webp', 'jpeg')
+PRODUCTS_IMAGE_VARIANTS_DIR = 'variants'
+PRODUCTS_IMAGE_WORKERS = int(os.environ.get('PRODUCTS_IMAGE_WORKERS', 0))
+
+# Per-request summary lines are INFO; set PRODUCTS_REQUEST_LOG_LEVEL=INFO
+# to print them (N+1 warnings are always shown)
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'products.instrumentation': {
+            'handlers': ['console'],
+            'level': os.environ.get('PRODUCTS_REQUEST_LOG_LEVEL', 'WARNING'),
+            'propagate': False,
+        },
+    },
 }
 
 
@@ -134,7 +284,8 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.AllowAny',
     ],
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        # orjson-backed drop-in for rest_framework.renderers.JSONRenderer
+        'products.renderers.ORJSONRenderer',
         'rest_framework.renderers.BrowsableAPIRenderer',
     ],
     'DEFAULT_FILTER_BACKENDS': [
@@ -146,6 +297,10 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 20,
 }
 
+# MessagePack responses (Accept: application/msgpack) when msgpack is installed
+if find_spec('msgpack') is not None:
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'].append('products.renderers.MessagePackRenderer')
+
 # CORS settings for frontend integration
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
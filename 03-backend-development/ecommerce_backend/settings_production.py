@@ -0,0 +1,33 @@
+"""
+Production settings profile for ecommerce_backend.
+
+Use with DJANGO_SETTINGS_MODULE=ecommerce_backend.settings_production.
+Builds on the development settings and only overrides what differs.
+"""
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .settings import *  # noqa: F401,F403
+from .settings import REST_FRAMEWORK
+
+DEBUG = False
+
+# Never fall back to the development key committed to the repository
+SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY')
+if not SECRET_KEY:
+    raise ImproperlyConfigured('Set DJANGO_SECRET_KEY to use the production settings')
+
+ALLOWED_HOSTS = [
+    host.strip() for host in os.environ.get('DJANGO_ALLOWED_HOSTS', '').split(',') if host.strip()
+]
+
+# No browsable API in production: every response goes through the fast
+# renderers and never pays for HTML form rendering
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    'DEFAULT_RENDERER_CLASSES': [
+        renderer for renderer in REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES']
+        if renderer != 'rest_framework.renderers.BrowsableAPIRenderer'
+    ],
+}
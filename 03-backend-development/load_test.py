@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Concurrent load test for the e-commerce backend API.
+
+Drives weighted scenarios (browse, search, detail, post review) from a
+pool of worker threads and prints throughput and p50/p95/p99 latency per
+endpoint as JSON, so runs can be saved and compared over time.
+
+Without --url a development server is started on a free local port and
+stopped afterwards. Only the standard library is used.
+
+    python load_test.py --concurrency 16 --duration 30 --output run.json
+    python load_test.py --url http://127.0.0.1:8002/api --weights browse=6,search=3,detail=1,review=0
+
+Note: the review scenario creates real reviews in the target database.
+"""
+
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+DEFAULT_WEIGHTS = {'browse': 50, 'search': 30, 'detail': 15, 'review': 5}
+ORDERINGS = ['-created_at', 'price', '-price', '-rating', 'name']
+SEARCH_TERMS = ['phone', 'pro', 'wireless', 'shoes', 'book', 'laptop', 'air', 'smart']
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies, errors, elapsed):
+    latencies = sorted(latencies)
+    return {
+        'requests': len(latencies) + errors,
+        'errors': errors,
+        'throughput_rps': round((len(latencies) + errors) / elapsed, 2),
+        'p50_ms': _ms(percentile(latencies, 0.50)),
+        'p95_ms': _ms(percentile(latencies, 0.95)),
+        'p99_ms': _ms(percentile(latencies, 0.99)),
+        'max_ms': _ms(latencies[-1] if latencies else None),
+    }
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 2)
+
+
+def parse_weights(value):
+    weights = dict(DEFAULT_WEIGHTS)
+    for item in filter(None, value.split(',')):
+        name, _, weight = item.partition('=')
+        if name not in DEFAULT_WEIGHTS:
+            raise argparse.ArgumentTypeError(f'unknown scenario {name!r}')
+        weights[name] = int(weight)
+    if not any(weights.values()):
+        raise argparse.ArgumentTypeError('at least one scenario needs a positive weight')
+    return weights
+
+
+class Client:
+    """Minimal JSON HTTP client on urllib"""
+
+    def __init__(self, base_url, timeout):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def request(self, method, path, payload=None):
+        data = None
+        headers = {'Accept': 'application/json'}
+        if payload is not None:
+            data = json.dumps(payload).encode()
+            headers['Content-Type'] = 'application/json'
+        request = urllib.request.Request(self.base_url + path, data=data, headers=headers, method=method)
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as exc:
+            return exc.code, exc.read()
+
+    def get_json(self, path):
+        status, body = self.request('GET', path)
+        if status != 200:
+            raise RuntimeError(f'GET {path} returned {status}')
+        return json.loads(body)
+
+
+class LoadTest:
+    def __init__(self, client, weights, seed):
+        self.client = client
+        self.scenarios = [name for name, weight in weights.items() if weight > 0]
+        self.weights = [weights[name] for name in self.scenarios]
+        self.seed = seed
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def discover(self):
+        """Collect ids to request from the running API"""
+        products = self.client.get_json('/products/?page_size=100')['results']
+        if not products:
+            raise RuntimeError('The catalog is empty; run populate_sample_data.py first')
+        self.product_ids = [product['id'] for product in products]
+        categories = self.client.get_json('/categories/')['results']
+        self.category_ids = [category['id'] for category in categories]
+
+    # Each scenario returns (endpoint label, method, path, payload, expected status)
+
+    def browse(self, rng):
+        params = f'?ordering={rng.choice(ORDERINGS)}&page_size=20'
+        if self.category_ids and rng.random() < 0.5:
+            params += f'&category={rng.choice(self.category_ids)}'
+        return 'GET /products/', 'GET', '/products/' + params, None, 200
+
+    def search(self, rng):
+        path = f'/search/?q={rng.choice(SEARCH_TERMS)}'
+        if rng.random() < 0.3:
+            path += '&in_stock=true'
+        return 'GET /search/', 'GET', path, None, 200
+
+    def detail(self, rng):
+        return 'GET /products/{id}/', 'GET', f'/products/{rng.choice(self.product_ids)}/', None, 200
+
+    def review(self, rng):
+        product_id = rng.choice(self.product_ids)
+        payload = {
+            'product': product_id,
+            'user_name': 'Load Test',
+            'user_email': 'loadtest@example.com',
+            'rating': rng.randint(1, 5),
+            'title': 'Load test review',
+            'comment': 'Created by load_test.py',
+        }
+        return 'POST /products/{id}/reviews/', 'POST', f'/products/{product_id}/reviews/', payload, 201
+
+    def worker(self, number, deadline, max_requests):
+        rng = random.Random(self.seed + number)
+        latencies = defaultdict(list)
+        errors = defaultdict(int)
+        sent = 0
+        while time.monotonic() < deadline and (max_requests is None or sent < max_requests):
+            scenario = rng.choices(self.scenarios, self.weights)[0]
+            label, method, path, payload, expected = getattr(self, scenario)(rng)
+            started = time.perf_counter()
+            try:
+                status, _ = self.client.request(method, path, payload)
+            except (OSError, urllib.error.URLError):
+                status = None
+            elapsed = time.perf_counter() - started
+            if status == expected:
+                latencies[label].append(elapsed)
+            else:
+                errors[label] += 1
+            sent += 1
+        with self.lock:
+            for label, values in latencies.items():
+                self.latencies[label] += values
+            for label, count in errors.items():
+                self.errors[label] += count
+
+    def run(self, concurrency, duration, requests_per_worker):
+        deadline = time.monotonic() + duration
+        started = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            for future in [pool.submit(self.worker, n, deadline, requests_per_worker) for n in range(concurrency)]:
+                future.result()
+        elapsed = time.perf_counter() - started
+
+        labels = sorted(set(self.latencies) | set(self.errors))
+        all_latencies = [value for label in labels for value in self.latencies[label]]
+        return {
+            'elapsed_s': round(elapsed, 3),
+            'total': summarize(all_latencies, sum(self.errors.values()), elapsed),
+            'endpoints': {
+                label: summarize(self.latencies[label], self.errors[label], elapsed)
+                for label in labels
+            },
+        }
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port, timeout=30):
+    """Start `manage.py runserver` and wait until the health check answers"""
+    manage = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'manage.py')
+    process = subprocess.Popen(
+        [sys.executable, manage, 'runserver', '--noreload', f'127.0.0.1:{port}'],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    client = Client(f'http://127.0.0.1:{port}/api', timeout=2)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('The development server exited during startup')
+        try:
+            if client.request('GET', '/health/')[0] == 200:
+                return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError('The development server did not start in time')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--url', help='API base URL; starts a local server when omitted')
+    parser.add_argument('--concurrency', type=int, default=8, help='Worker threads (default: 8)')
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds to run (default: 10)')
+    parser.add_argument('--requests', type=int, help='Stop each worker after this many requests')
+    parser.add_argument('--weights', type=parse_weights, default=dict(DEFAULT_WEIGHTS),
+                        help='Scenario weights, e.g. browse=50,search=30,detail=15,review=5')
+    parser.add_argument('--timeout', type=float, default=30.0, help='Per-request timeout in seconds')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed for scenario selection')
+    parser.add_argument('--output', help='Also write the JSON report to this file')
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.url
+    if base_url is None:
+        port = free_port()
+        print(f'Starting development server on port {port}...', file=sys.stderr)
+        server = start_server(port)
+        base_url = f'http://127.0.0.1:{port}/api'
+
+    try:
+        load_test = LoadTest(Client(base_url, args.timeout), args.weights, args.seed)
+        load_test.discover()
+        print(f'Running {args.concurrency} workers for {args.duration:g}s against {base_url}...',
+              file=sys.stderr)
+        results = load_test.run(args.concurrency, args.duration, args.requests)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    report = {
+        'started_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'base_url': base_url,
+        'concurrency': args.concurrency,
+        'duration_s': args.duration,
+        'weights': args.weights,
+        'seed': args.seed,
+        **results,
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as stream:
+            stream.write(output + '\n')
+    return 1 if report['total']['errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -17,8 +17,8 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ecommerce_backend.settings')
 django.setup()
 
 from products.models import Category, Brand, Product, Review
+from products.ratings import rebuild_all as rebuild_ratings
 from decimal import Decimal
-from django.db.models import Avg
 
 def create_sample_data():
     """Create sample data for the e-commerce backend."""
@@ -255,17 +255,10 @@ def create_sample_data():
     
     print(f"Created {review_count} reviews")
     
-    # Update product ratings based on reviews
-    for product in products:
-        reviews = Review.objects.filter(product=product)
-        if reviews.exists():
-            avg_rating = reviews.aggregate(
-                avg_rating=Avg('rating')
-            )['avg_rating']
-            product.rating = round(avg_rating, 2)
-            product.review_count = reviews.count()
-            product.save()
-            print(f"Updated {product.name} rating: {product.rating} ({product.review_count} reviews)")
+    # Review signals keep ratings up to date incrementally; a full rebuild
+    # (one grouped query) also repairs any drift from earlier runs
+    reviewed = rebuild_ratings()
+    print(f"Rebuilt ratings for {reviewed} reviewed products")
     
     print("\nSample data creation completed!")
     print(f"Categories: {Category.objects.count()}")
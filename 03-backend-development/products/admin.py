@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Category, Brand, Product, ProductImage, Review
+from .models import Category, Brand, Product, ProductImage, Review, Tag
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
@@ -78,3 +78,10 @@ class ReviewAdmin(admin.ModelAdmin):
     search_fields = ['product__name', 'user_name', 'title', 'comment']
     ordering = ['-created_at']
     readonly_fields = ['created_at', 'updated_at']
+
+
+
+@admin.register(Tag)
+class TagAdmin(admin.ModelAdmin):
+    list_display = ['name']
+    search_fields = ['name']
@@ -0,0 +1,211 @@
+"""
+Async variants of the catalog read endpoints, mounted under /api/async/.
+
+Served by an ASGI server (`ecommerce_backend.asgi:application`), these
+views await the database through Django's async ORM instead of holding a
+worker thread for the whole request, so a slow search does not block
+other requests. DRF views are synchronous, so these are plain Django
+views: they return the same JSON as their synchronous counterparts, but
+response caching, conditional GET and the browsable API only apply to
+the synchronous endpoints.
+"""
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.http import HttpResponse
+from django.views.decorators.http import require_GET
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from . import counting
+from .filtering import filter_products
+from .instrumentation import timed
+from .models import Product
+from .pagination import paginate_keyset, parse_page_params, wants_cursor
+from .renderers import ORJSONRenderer
+from .serializers import FastProductListSerializer, ProductDetailSerializer, top_reviews_prefetch
+from .tagging import filter_by_tags
+
+# Mirror ProductListView / ProductPagination
+LIST_ORDERING_FIELDS = ('price', 'rating', 'created_at', 'name')
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def json_response(data, status=200):
+    with timed('render'):
+        body = ORJSONRenderer().render(data)
+    return HttpResponse(body, status=status, content_type='application/json')
+
+
+def error_response(error, details):
+    return json_response({'error': error, 'details': details}, status=400)
+
+
+def get_page_size(params):
+    """Same rules as ProductPagination: invalid values fall back to the default"""
+    try:
+        page_size = int(params['page_size'])
+    except (KeyError, ValueError):
+        return DEFAULT_PAGE_SIZE
+    return min(page_size, MAX_PAGE_SIZE) if page_size > 0 else DEFAULT_PAGE_SIZE
+
+
+def list_queryset(params):
+    """ProductListView's filters and ordering (search is served by /search/)"""
+    products = Product.objects.select_related('category', 'brand')
+    for field in ('category', 'brand'):
+        if params.get(field):
+            products = products.filter(**{field: params[field]})
+    if params.get('in_stock'):
+        products = products.filter(in_stock=params['in_stock'].lower() in ('true', '1'))
+    if params.get('min_price'):
+        products = products.filter(price__gte=params['min_price'])
+    if params.get('max_price'):
+        products = products.filter(price__lte=params['max_price'])
+    if params.get('min_rating'):
+        products = products.filter(rating__gte=params['min_rating'])
+
+    ordering = [
+        term.strip() for term in params.get('ordering', '').split(',')
+        if term.strip().lstrip('-') in LIST_ORDERING_FIELDS
+    ]
+    products = products.order_by(*(ordering or ['-created_at']))
+    return filter_by_tags(products, params)
+
+
+async def fetch(rows):
+    return [row async for row in rows]
+
+
+@require_GET
+async def api_overview(request):
+    """Async API overview"""
+    return json_response({
+        'message': 'E-commerce Backend API (async)',
+        'version': '1.0.0',
+        'endpoints': {
+            'API Overview': '/api/async/',
+            'Products': '/api/async/products/',
+            'Product Detail': '/api/async/products/<uuid:id>/',
+            'Product Search': '/api/async/search/?q=<query>&category=<id>&brand=<id>&min_price=<price>&max_price=<price>&min_rating=<rating>&in_stock=<true/false>',
+        },
+    })
+
+
+@require_GET
+async def product_list(request):
+    """Async product list, page number or keyset paginated like /api/products/"""
+    params = request.GET
+    context = {'request': request}
+    page_size = get_page_size(params)
+    try:
+        rows = FastProductListSerializer.get_rows(list_queryset(params))
+        if wants_cursor(params):
+            keyset_page = await sync_to_async(paginate_keyset)(rows, params.get('cursor'), page_size)
+            url = remove_query_param(request.build_absolute_uri(), 'pagination')
+            return json_response({
+                'next': keyset_page.next_cursor and replace_query_param(url, 'cursor', keyset_page.next_cursor),
+                'previous': keyset_page.previous_cursor and replace_query_param(url, 'cursor', keyset_page.previous_cursor),
+                'results': FastProductListSerializer(keyset_page.results, context=context).data,
+            })
+
+        count = await rows.acount()
+        try:
+            page = int(params.get('page', 1))
+        except ValueError:
+            page = 0
+        last_page = max((count + page_size - 1) // page_size, 1)
+        if not 1 <= page <= last_page:
+            return json_response({'detail': 'Invalid page.'}, status=404)
+        results = await fetch(rows[(page - 1) * page_size:page * page_size])
+    except ValidationError as exc:
+        return error_response('Invalid filter', exc.messages)
+
+    url = request.build_absolute_uri()
+    previous_url = None
+    if page > 1:
+        previous_url = remove_query_param(url, 'page') if page == 2 else replace_query_param(url, 'page', page - 1)
+    return json_response({
+        'count': count,
+        'next': replace_query_param(url, 'page', page + 1) if page < last_page else None,
+        'previous': previous_url,
+        'results': FastProductListSerializer(results, context=context).data,
+    })
+
+
+@require_GET
+async def product_detail(request, pk):
+    """Async product detail"""
+    products = Product.objects.select_related('category', 'brand').prefetch_related(
+        'images', top_reviews_prefetch()
+    )
+    try:
+        product = await products.aget(pk=pk)
+    except Product.DoesNotExist:
+        return json_response({'detail': 'No Product matches the given query.'}, status=404)
+    # Everything the serializer reads is loaded, so no query runs here
+    return json_response(ProductDetailSerializer(product, context={'request': request}).data)
+
+
+@require_GET
+async def product_search(request):
+    """Async advanced search, same parameters and response as /api/search/"""
+    params = request.GET
+    count_strategy = params.get(counting.COUNT_PARAM, counting.EXACT)
+    if count_strategy not in counting.COUNT_STRATEGIES:
+        return error_response(
+            'Invalid count strategy', f"Choose one of: {', '.join(counting.COUNT_STRATEGIES)}"
+        )
+    products = Product.objects.select_related('category', 'brand')
+    if params.get('q'):
+        # `q` may check for the FTS table, a (cached) introspection query
+        products = await sync_to_async(filter_products)(products, params)
+    else:
+        products = filter_products(products, params)
+    products = products.order_by('-rating', '-created_at')
+    rows = FastProductListSerializer.get_rows(products)
+    try:
+        page, page_size = parse_page_params(params)
+    except ValueError as exc:
+        return error_response('Invalid page', str(exc))
+
+    if wants_cursor(params):
+        keyset_page = await sync_to_async(paginate_keyset)(rows, params.get('cursor'), page_size)
+        data = {
+            'count': await sync_to_async(counting.get_count)(products, params, count_strategy),
+            'count_strategy': count_strategy,
+            'page_size': page_size,
+            'next_cursor': keyset_page.next_cursor,
+            'previous_cursor': keyset_page.previous_cursor,
+            'results': FastProductListSerializer(keyset_page.results).data,
+        }
+        if count_strategy == counting.ESTIMATED:
+            data['has_more'] = keyset_page.next_cursor is not None
+        return json_response(data)
+
+    start = (page - 1) * page_size
+    end = start + page_size
+
+    has_more = None
+    if count_strategy == counting.ESTIMATED:
+        page_rows = await fetch(rows[start:end + 1])
+        has_more = len(page_rows) > page_size
+        results = page_rows[:page_size]
+        total_count = counting.estimated_total(start, len(results), has_more)
+    else:
+        if count_strategy == counting.EXACT:
+            total_count = await products.acount()
+        else:
+            total_count = await sync_to_async(counting.get_count)(products, params, count_strategy)
+        results = await fetch(rows[start:end])
+
+    data = {
+        'count': total_count,
+        'count_strategy': count_strategy,
+        'page': page,
+        'page_size': page_size,
+        'total_pages': (total_count + page_size - 1) // page_size if total_count is not None else None,
+        'results': FastProductListSerializer(results).data,
+    }
+    if has_more is not None:
+        data['has_more'] = has_more
+    return json_response(data)
@@ -0,0 +1,227 @@
+"""
+Microbenchmark suite for the catalog hot paths.
+
+A benchmark is a setup function registered with `@benchmark`: it gets the
+`Dataset` under test and returns the callable to time. Timing works like
+pytest-benchmark: a calibration step picks how many iterations make up
+one round (enough to be well above the timer resolution), then rounds
+are repeated for at least `min_rounds` and `max_time`, with the garbage
+collector paused so its pauses do not land in random rounds. Statistics
+are seconds per iteration.
+
+Results are plain JSON so runs can be saved and compared later with
+`compare`; see `manage.py benchmark`.
+"""
+import gc
+import platform
+import statistics
+import time
+
+import django
+from django.http import QueryDict
+from django.test import Client, RequestFactory
+from django.urls import reverse
+from rest_framework.request import Request
+
+from .filtering import filter_products
+from .models import Product
+from .serializers import (
+    FastProductListSerializer, ProductDetailSerializer, ProductListSerializer, top_reviews_prefetch,
+)
+from .views import ProductListView
+
+# name -> setup function, in registration order
+SUITE = {}
+STATS = ('min', 'max', 'mean', 'stddev', 'median')
+PAGE_SIZE = 20
+MIN_ROUND_TIME = 0.002
+
+
+def benchmark(name):
+    """Register a setup function under `name`"""
+    def register(setup):
+        SUITE[name] = setup
+        return setup
+    return register
+
+
+class Dataset:
+    """The catalog under test and the ids benchmarks request"""
+
+    def __init__(self, size, search_query='wireless'):
+        self.size = size
+        self.search_query = search_query
+        products = Product.objects.order_by('-review_count')
+        # Worst case detail: the product with the most reviews
+        self.product_id = products.values_list('id', flat=True).first()
+        self.category_id = products.values_list('category_id', flat=True).first()
+        self.request = RequestFactory(SERVER_NAME='testserver').get('/api/products/')
+
+
+def run_benchmark(func, max_time=0.5, min_rounds=5):
+    """Time `func` and return per-iteration statistics"""
+    func()  # warm up caches and lazy imports
+    gc.collect()
+    gc.disable()
+    try:
+        timings, iterations = _time_rounds(func, max_time, min_rounds)
+    finally:
+        gc.enable()
+
+    return {
+        'min': min(timings),
+        'max': max(timings),
+        'mean': statistics.fmean(timings),
+        'stddev': statistics.stdev(timings) if len(timings) > 1 else 0.0,
+        'median': statistics.median(timings),
+        'rounds': len(timings),
+        'iterations': iterations,
+        'ops': 1 / statistics.fmean(timings),
+    }
+
+
+def _time_rounds(func, max_time, min_rounds):
+    iterations = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        duration = time.perf_counter() - started
+        if duration >= MIN_ROUND_TIME:
+            break
+        iterations *= 10
+
+    timings = [duration / iterations]
+    deadline = time.perf_counter() + max_time
+    while len(timings) < min_rounds or time.perf_counter() < deadline:
+        started = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        timings.append((time.perf_counter() - started) / iterations)
+    return timings, iterations
+
+
+def run_suite(dataset, selected=None, max_time=0.5, min_rounds=5):
+    """Yield one result dict per benchmark whose name contains `selected`"""
+    for name, setup in SUITE.items():
+        if selected and selected not in name:
+            continue
+        stats = run_benchmark(setup(dataset), max_time=max_time, min_rounds=min_rounds)
+        yield {
+            'name': f'{name}[{dataset.size}]',
+            'group': name,
+            'params': {'size': dataset.size},
+            'stats': stats,
+        }
+
+
+def machine_info():
+    return {
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+    }
+
+
+def compare(baseline, current, threshold=0.10, stat='min'):
+    """
+    Compare two saved runs benchmark by benchmark.
+
+    Returns (name, baseline value, current value, relative change,
+    regressed) tuples; a benchmark regresses when `stat` grew by more than
+    `threshold`. Benchmarks missing from the baseline have no change.
+    """
+    previous = {result['name']: result['stats'][stat] for result in baseline['benchmarks']}
+    rows = []
+    for result in current['benchmarks']:
+        value = result['stats'][stat]
+        before = previous.get(result['name'])
+        change = None if before is None else (value - before) / before
+        rows.append((result['name'], before, value, change, change is not None and change > threshold))
+    return rows
+
+
+# Serializers: one page of rows, already fetched
+
+@benchmark('serializer.product_list')
+def product_list_serializer(dataset):
+    context = {'request': dataset.request}
+    page = list(Product.objects.select_related('category', 'brand')[:PAGE_SIZE])
+    return lambda: ProductListSerializer(page, many=True, context=context).data
+
+
+@benchmark('serializer.product_list_fast')
+def fast_product_list_serializer(dataset):
+    context = {'request': dataset.request}
+    page = list(FastProductListSerializer.get_rows(Product.objects.all())[:PAGE_SIZE])
+    return lambda: FastProductListSerializer(page, many=True, context=context).data
+
+
+@benchmark('serializer.product_detail')
+def product_detail_serializer(dataset):
+    context = {'request': dataset.request}
+    product = Product.objects.select_related('category', 'brand').prefetch_related(
+        'images', top_reviews_prefetch()
+    ).get(pk=dataset.product_id)
+    return lambda: ProductDetailSerializer(product, context=context).data
+
+
+# Query paths: count plus the first page, as the paginators run them
+
+@benchmark('queryset.product_list')
+def product_list_queryset(dataset):
+    view = ProductListView()
+    request = RequestFactory().get('/api/products/', {'category': dataset.category_id, 'ordering': '-rating'})
+    view.setup(request)
+    view.request = Request(request)
+    view.format_kwarg = None
+
+    def run():
+        products = view.filter_queryset(view.get_queryset())
+        products.count()
+        return list(FastProductListSerializer.get_rows(products)[:PAGE_SIZE])
+    return run
+
+
+@benchmark('queryset.product_search')
+def product_search_queryset(dataset):
+    params = QueryDict(f'q={dataset.search_query}&in_stock=true')
+
+    def run():
+        products = filter_products(Product.objects.select_related('category', 'brand'), params)
+        products = products.order_by('-rating', '-created_at')
+        products.count()
+        return list(FastProductListSerializer.get_rows(products)[:PAGE_SIZE])
+    return run
+
+
+# End to end through the test client (middleware, routing, rendering)
+
+def _get(path, params=None):
+    client = Client()
+    response = client.get(path, params)
+    if response.status_code != 200:
+        raise RuntimeError(f'GET {path} returned {response.status_code}')
+    return lambda: client.get(path, params)
+
+
+@benchmark('view.product_list')
+def product_list_view(dataset):
+    return _get(reverse('product-list'), {'ordering': '-rating'})
+
+
+@benchmark('view.product_list_sparse')
+def sparse_product_list_view(dataset):
+    # Grid view: ?fields= leaves description, tags and the joins out of the query
+    return _get(reverse('product-list'), {'ordering': '-rating', 'fields': 'id,name,price,thumbnail'})
+
+
+@benchmark('view.product_detail')
+def product_detail_view(dataset):
+    return _get(reverse('product-detail', args=[dataset.product_id]))
+
+
+@benchmark('view.product_search')
+def product_search_view(dataset):
+    return _get(reverse('product-search'), {'q': dataset.search_query})
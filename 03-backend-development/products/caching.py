@@ -0,0 +1,159 @@
+"""
+Cache helpers for the products app.
+
+Cached values are namespaced with a per-model version counter instead of
+being deleted one by one: a write to a model bumps its counter (see
+`products.signals`), which makes every key built from the old version
+unreachable at once. Stale entries simply expire.
+
+`CachedResponseMixin` builds on this to cache whole rendered API
+responses: the key combines the request path, the normalized query
+string and the versions of every model the view reads, so a cache hit
+returns the stored bytes without touching the database, the serializer
+or the renderer.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+from rest_framework.response import Response
+
+from .instrumentation import timed
+from .metrics import record_cache
+
+VERSION_KEY = 'products:version:{}'
+RESPONSE_KEY = 'products:response:{}:{}'
+DEFAULT_RESPONSE_TIMEOUT = 300
+
+# Response headers replayed on cache hits. DRF sets Vary and Allow on the
+# response; without them a hit would be cached downstream for any Accept.
+CACHED_HEADERS = ('ETag', 'Last-Modified', 'Vary', 'Allow')
+
+
+def get_cache():
+    """Cache used by the products app (`PRODUCTS_CACHE_ALIAS`, default 'default')"""
+    return caches[getattr(settings, 'PRODUCTS_CACHE_ALIAS', 'default')]
+
+
+def get_version(model_name):
+    """Current version counter for a model, e.g. get_version('product')"""
+    cache = get_cache()
+    key = VERSION_KEY.format(model_name)
+    version = cache.get(key)
+    if version is None:
+        # add() is a no-op if another worker initialised the counter first
+        cache.add(key, 1, timeout=None)
+        version = cache.get(key, 1)
+    return version
+
+
+def get_versions(model_names):
+    """Version counters for several models in a single cache round trip"""
+    cache = get_cache()
+    keys = {name: VERSION_KEY.format(name) for name in model_names}
+    found = cache.get_many(keys.values())
+    versions = []
+    for name, key in keys.items():
+        version = found.get(key)
+        if version is None:
+            version = get_version(name)
+        versions.append(version)
+    return versions
+
+
+def bump_version(model_name):
+    """Invalidate every cache entry built from `model_name` data"""
+    cache = get_cache()
+    key = VERSION_KEY.format(model_name)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Counter missing (first write or evicted): start a fresh namespace
+        cache.set(key, 2, timeout=None)
+        return 2
+
+
+def normalize_query(query_params, ignore=()):
+    """Stable string for a query string: sorted keys and values, blanks dropped"""
+    items = []
+    for key in sorted(query_params.keys()):
+        if key in ignore:
+            continue
+        values = [value.strip() for value in query_params.getlist(key)]
+        if key == 'q':
+            # Search is case-insensitive and ignores repeated whitespace
+            values = [' '.join(value.lower().split()) for value in values]
+        values = [value for value in values if value]
+        if values:
+            items.append(f'{key}={",".join(sorted(values))}')
+    return '&'.join(items)
+
+
+class CachedResponseMixin:
+    """
+    Serve GET responses of a DRF view from the products cache.
+
+    `cache_dependencies` lists the model names (as used by `bump_version`)
+    whose data ends up in the response; a write to any of them invalidates
+    the cached copy.
+    """
+    cache_dependencies = ()
+    cacheable_formats = ('json', 'msgpack')
+
+    def get_cache_timeout(self):
+        return getattr(settings, 'PRODUCTS_RESPONSE_CACHE_TIMEOUT', DEFAULT_RESPONSE_TIMEOUT)
+
+    def get_response_cache_key(self, request):
+        versions = '.'.join(str(v) for v in get_versions(self.cache_dependencies))
+        # Host is part of the key because paginated responses embed absolute links
+        raw = '|'.join([
+            request.get_host(), request.path,
+            normalize_query(request.query_params),
+            request.accepted_renderer.format,
+        ])
+        return RESPONSE_KEY.format(versions, hashlib.sha1(raw.encode()).hexdigest())
+
+    def get(self, request, *args, **kwargs):
+        self.response_cache_key = None
+        if request.accepted_renderer.format in self.cacheable_formats:
+            key = self.get_response_cache_key(request)
+            cached = get_cache().get(key)
+            record_cache('response', cached is not None)
+            if cached is not None:
+                return self.cached_response(request, *cached)
+            self.response_cache_key = key
+        return super().get(request, *args, **kwargs)
+
+    def cached_response(self, request, content, content_type, headers):
+        response = HttpResponse(content, content_type=content_type)
+        for name, value in headers.items():
+            response[name] = value
+        response['X-Cache'] = 'HIT'
+        # Stored validators are as fresh as the entry itself (same versions),
+        # so revalidation can be answered without touching the database
+        last_modified = headers.get('Last-Modified')
+        return get_conditional_response(
+            request,
+            etag=headers.get('ETag'),
+            last_modified=parse_http_date_safe(last_modified) if last_modified else None,
+            response=response,
+        )
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        key = getattr(self, 'response_cache_key', None)
+        timeout = self.get_cache_timeout()
+        if key and timeout != 0 and isinstance(response, Response) and response.status_code == 200:
+            with timed('render'):
+                response.render()
+            headers = {
+                name: response[name] for name in CACHED_HEADERS if response.has_header(name)
+            }
+            get_cache().set(
+                key, (response.content, response['Content-Type'], headers), timeout,
+            )
+            response['X-Cache'] = 'MISS'
+        return response
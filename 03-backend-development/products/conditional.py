@@ -0,0 +1,75 @@
+"""
+Conditional GET support (ETag / Last-Modified) for catalog views.
+
+Validators are derived from cheap aggregate queries - max(`updated_at`)
+and row counts - rather than from the serialized body, so answering a
+revalidation with 304 Not Modified never runs the serializer.
+"""
+import datetime
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from .caching import normalize_query
+
+
+def make_etag(request, values):
+    """Weak ETag from the request identity and the validator values"""
+    raw = '|'.join([
+        request.path,
+        normalize_query(request.query_params),
+        request.accepted_renderer.format,
+        repr(sorted(values.items())),
+    ])
+    return 'W/"%s"' % hashlib.md5(raw.encode(), usedforsecurity=False).hexdigest()
+
+
+def latest_timestamp(values):
+    timestamps = [value for value in values.values() if isinstance(value, datetime.datetime)]
+    return int(max(timestamps).timestamp()) if timestamps else None
+
+
+class ConditionalGetMixin:
+    """
+    Emit ETag / Last-Modified on GET and answer matching
+    If-None-Match / If-Modified-Since requests with 304.
+
+    `validator_fields` are the timestamp fields whose maximum changes when
+    the response does; related fields (e.g. 'category__updated_at') are
+    allowed.
+    """
+    validator_fields = ('updated_at',)
+
+    def get_validator_values(self):
+        """
+        Values that change whenever the response body would.
+
+        Returns None when the requested object does not exist, leaving the
+        404 to the normal view code.
+        """
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        if lookup_url_kwarg in self.kwargs:
+            return self.get_queryset().filter(
+                **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+            ).values(*self.validator_fields).first()
+
+        aggregates = {field: Max(field) for field in self.validator_fields}
+        aggregates['rows'] = Count('pk')
+        return self.filter_queryset(self.get_queryset()).order_by().aggregate(**aggregates)
+
+    def get(self, request, *args, **kwargs):
+        values = self.get_validator_values()
+        if values is None:
+            return super().get(request, *args, **kwargs)
+
+        etag = make_etag(request, values)
+        last_modified = latest_timestamp(values)
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        response = not_modified or super().get(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+        return response
@@ -0,0 +1,66 @@
+"""
+Count strategies for paginated product search.
+
+`COUNT(*)` over a filtered product queryset costs about as much as fetching
+the page itself, so clients can choose how the total is obtained:
+
+- ``exact``: run ``COUNT(*)`` on every request (default)
+- ``cached``: reuse a count cached per normalized filter set; product
+  writes bump the product version and invalidate every cached count
+- ``estimated``: skip counting; fetch one extra row to report ``has_more``
+  and give a lower-bound count
+"""
+import hashlib
+
+from .caching import get_cache, get_version, normalize_query
+from .metrics import record_cache
+
+EXACT = 'exact'
+CACHED = 'cached'
+ESTIMATED = 'estimated'
+COUNT_STRATEGIES = (EXACT, CACHED, ESTIMATED)
+
+COUNT_PARAM = 'count'
+COUNT_CACHE_TIMEOUT = 300
+
+# Parameters that select a page rather than a result set
+PAGINATION_PARAMS = {'page', 'page_size', 'cursor', 'pagination', COUNT_PARAM}
+
+
+def normalize_filters(query_params):
+    """Stable string for the filter set of a request (order independent)"""
+    return normalize_query(query_params, ignore=PAGINATION_PARAMS)
+
+
+def cached_count(queryset, query_params, prefix='search'):
+    """COUNT(*) cached per filter set and product version"""
+    digest = hashlib.sha1(normalize_filters(query_params).encode()).hexdigest()
+    key = f'products:count:{prefix}:{get_version("product")}:{digest}'
+    cache = get_cache()
+    total = cache.get(key)
+    record_cache('count', total is not None)
+    if total is None:
+        total = queryset.count()
+        cache.set(key, total, COUNT_CACHE_TIMEOUT)
+    return total
+
+
+def estimated_total(start, page_length, has_more):
+    """
+    Lower-bound total for the `estimated` strategy, from a page fetched
+    with one extra row: the rows before the page, the page itself, and one
+    more if another row follows. None for an empty page past the first
+    row, where the rows before `start` may not exist.
+    """
+    if not page_length and start:
+        return None
+    return start + page_length + int(has_more)
+
+
+def get_count(queryset, query_params, strategy):
+    """Total for `exact` and `cached` strategies; None for `estimated`"""
+    if strategy == CACHED:
+        return cached_count(queryset, query_params)
+    if strategy == EXACT:
+        return queryset.count()
+    return None
@@ -0,0 +1,67 @@
+"""
+Streaming NDJSON catalog export.
+
+Products are read with a chunked `.iterator()` and every chunk is
+serialized and encoded before the next one is fetched, so memory use
+depends on the chunk size rather than on the size of the catalog. Each
+line is one product in the same shape as the product list endpoint.
+Used by `/api/export/` and `manage.py export_catalog`.
+"""
+from itertools import islice
+
+from django.utils.text import compress_sequence
+
+from .filtering import filter_products
+from .models import Product
+from .renderers import ORJSONRenderer
+from .serializers import FastProductListSerializer
+
+NDJSON_CONTENT_TYPE = 'application/x-ndjson'
+DEFAULT_CHUNK_SIZE = 2000
+
+
+def accepts_gzip(accept_encoding):
+    """
+    Whether an Accept-Encoding header allows gzip, honouring q-values:
+    `gzip;q=0` refuses it, and `*` covers it unless gzip is listed.
+    """
+    qualities = {}
+    for item in accept_encoding.split(','):
+        coding, *params = [part.strip() for part in item.split(';')]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding:
+            qualities[coding.lower()] = quality
+    quality = qualities.get('gzip', qualities.get('x-gzip', qualities.get('*', 0.0)))
+    return quality > 0
+
+
+def export_queryset(params):
+    """Products selected by the search parameters, in a stable order"""
+    products = filter_products(Product.objects.all(), params)
+    # Served by the (created_at, id) index on Product
+    return FastProductListSerializer.get_rows(products.order_by('created_at', 'id'))
+
+
+def iter_ndjson(rows, context=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield one encoded chunk of NDJSON lines per `chunk_size` products"""
+    render = ORJSONRenderer().render
+    rows = rows.iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        data = FastProductListSerializer(chunk, many=True, context=context).data
+        yield b''.join(render(item) + b'\n' for item in data)
+
+
+def export_products(params, context=None, compress=False, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Byte chunks of the NDJSON export, gzip compressed on request"""
+    chunks = iter_ndjson(export_queryset(params), context=context, chunk_size=chunk_size)
+    return compress_sequence(chunks) if compress else chunks
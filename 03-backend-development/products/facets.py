@@ -0,0 +1,80 @@
+"""
+Facet counts for the storefront filter sidebar.
+
+All facets come from a single query: products are grouped by
+(category, brand) and every price bucket, rating threshold and stock
+flag is a conditional COUNT in the same SELECT. The handful of group
+rows is then rolled up in Python into per-category, per-brand and
+global counts.
+"""
+from decimal import Decimal
+
+from django.db.models import Count, Q
+
+# (min, max) price ranges; max is exclusive, None means open-ended
+PRICE_BUCKETS = [
+    (0, 25), (25, 50), (50, 100), (100, 250),
+    (250, 500), (500, 1000), (1000, None),
+]
+
+# "N stars & up" thresholds
+RATING_THRESHOLDS = [4, 3, 2, 1]
+
+
+def _price_condition(low, high):
+    condition = Q(price__gte=low)
+    if high is not None:
+        condition &= Q(price__lt=high)
+    return condition
+
+
+def compute_facets(products):
+    """Return facet counts for an already filtered product queryset"""
+    aggregates = {'total': Count('pk'), 'in_stock_total': Count('pk', filter=Q(in_stock=True))}
+    for index, (low, high) in enumerate(PRICE_BUCKETS):
+        aggregates[f'price_{index}'] = Count('pk', filter=_price_condition(low, high))
+    for threshold in RATING_THRESHOLDS:
+        aggregates[f'rating_{threshold}'] = Count(
+            'pk', filter=Q(rating__gte=Decimal(threshold))
+        )
+
+    groups = (
+        products.order_by()
+        .values('category_id', 'category__name', 'brand_id', 'brand__name')
+        .annotate(**aggregates)
+    )
+
+    categories = {}
+    brands = {}
+    totals = dict.fromkeys(aggregates, 0)
+    for row in groups:
+        category = categories.setdefault(
+            row['category_id'],
+            {'id': row['category_id'], 'name': row['category__name'], 'count': 0},
+        )
+        category['count'] += row['total']
+        brand = brands.setdefault(
+            row['brand_id'],
+            {'id': row['brand_id'], 'name': row['brand__name'], 'count': 0},
+        )
+        brand['count'] += row['total']
+        for key in totals:
+            totals[key] += row[key]
+
+    def by_count(items):
+        return sorted(items, key=lambda item: (-item['count'], item['name']))
+
+    return {
+        'total': totals['total'],
+        'categories': by_count(categories.values()),
+        'brands': by_count(brands.values()),
+        'price_ranges': [
+            {'min': low, 'max': high, 'count': totals[f'price_{index}']}
+            for index, (low, high) in enumerate(PRICE_BUCKETS)
+        ],
+        'ratings': [
+            {'min_rating': threshold, 'count': totals[f'rating_{threshold}']}
+            for threshold in RATING_THRESHOLDS
+        ],
+        'in_stock': totals['in_stock_total'],
+    }
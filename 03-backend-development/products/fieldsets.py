@@ -0,0 +1,128 @@
+"""
+Sparse fieldsets for the product endpoints.
+
+`?fields=id,name,price,thumbnail` returns only the named fields and
+`?exclude=description,tags` all but the named ones. The choice is pushed
+down to SQL: the queryset loads only the columns the remaining fields
+read (`.only()`, or `.values()` for the fast list serializer), joins only
+the relations they show and skips prefetches they do not embed, so large
+text and JSON columns such as `description`, `tags` and `specifications`
+are not read at all when they are not requested.
+
+Serializers taking part accept a `fields` argument (see
+`SparseFieldsMixin`) and describe fields that are not plain model
+columns in `column_sources`: {field: (model columns it reads, ...)}.
+Generic views parse the parameters with `SparseFieldsViewMixin`.
+"""
+from functools import lru_cache
+
+from django.db.models import Prefetch
+from rest_framework.exceptions import ParseError
+
+from .pagination import get_ordering
+
+FIELDS_PARAM = 'fields'
+EXCLUDE_PARAM = 'exclude'
+
+
+@lru_cache(maxsize=None)
+def field_names(serializer_class):
+    """Output field names of `serializer_class`, in output order"""
+    serializer_class = getattr(serializer_class, 'model_serializer', serializer_class)
+    return tuple(serializer_class().fields)
+
+
+def requested_fields(params, available):
+    """
+    Fields selected by ?fields= or ?exclude=, in `available` order, or None
+    when neither is given. Raises ParseError for unknown names.
+    """
+    include = params.get(FIELDS_PARAM)
+    exclude = params.get(EXCLUDE_PARAM)
+    if include is None and exclude is None:
+        return None
+    if include is not None and exclude is not None:
+        raise _invalid(f'Use either {FIELDS_PARAM} or {EXCLUDE_PARAM}, not both')
+    names = {name.strip() for name in (include if include is not None else exclude).split(',')}
+    names.discard('')
+    unknown = sorted(names.difference(available))
+    if unknown:
+        raise _invalid(f"Unknown field(s): {', '.join(unknown)}. Available: {', '.join(available)}")
+    if include is None:
+        return [name for name in available if name not in names]
+    if not names:
+        raise _invalid(f'{FIELDS_PARAM} must name at least one field')
+    return [name for name in available if name in names]
+
+
+def _invalid(details):
+    return ParseError({'error': 'Invalid fields', 'details': details})
+
+
+def field_columns(serializer_class, fields):
+    """Model columns read by `fields` of `serializer_class`"""
+    serializer_class = getattr(serializer_class, 'model_serializer', serializer_class)
+    sources = getattr(serializer_class, 'column_sources', {})
+    columns = {}
+    for name in fields:
+        for column in sources.get(name, (name,)):
+            columns[column] = None
+    return list(columns)
+
+
+def query_columns(queryset, serializer_class, fields):
+    """
+    Columns to load for `fields`, plus the sort keys: keyset pagination
+    builds its cursors from them.
+    """
+    columns = field_columns(serializer_class, fields)
+    return columns + [name for name, _ in get_ordering(queryset) if name not in columns]
+
+
+def restrict_queryset(queryset, serializer_class, fields):
+    """Load only what `fields` of `serializer_class` read"""
+    columns = query_columns(queryset, serializer_class, fields)
+    model = queryset.model
+    # Shown relations: traversed (category__name) or nested (category)
+    relations = {
+        column.split('__', 1)[0] for column in columns
+        if '__' in column or model._meta.get_field(column).many_to_one
+    }
+    prefetches = [
+        lookup for lookup in queryset._prefetch_related_lookups
+        if (lookup.prefetch_through if isinstance(lookup, Prefetch) else lookup).split('__', 1)[0] in fields
+    ]
+    queryset = queryset.select_related(None).prefetch_related(None)
+    if relations:
+        queryset = queryset.select_related(*sorted(relations))
+    return queryset.prefetch_related(*prefetches).only(*columns)
+
+
+class SparseFieldsMixin:
+    """Serializer mixin: keep only the fields listed in the `fields` argument"""
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class SparseFieldsViewMixin:
+    """
+    Generic view mixin: validate ?fields= / ?exclude= on GET into
+    `sparse_fields` and pass them on to the serializer. Querysets are
+    restricted by the view (see `restrict_queryset`).
+    """
+    sparse_fields = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.sparse_fields = None
+        if request.method == 'GET':
+            self.sparse_fields = requested_fields(request.query_params, field_names(self.get_serializer_class()))
+
+    def get_serializer(self, *args, **kwargs):
+        if self.sparse_fields is not None:
+            kwargs.setdefault('fields', self.sparse_fields)
+        return super().get_serializer(*args, **kwargs)
@@ -0,0 +1,66 @@
+"""
+Filters shared by product search, facets and export.
+
+Every endpoint that accepts the `/api/search/` query parameters goes
+through `filter_products`, so a filter set always selects the same rows
+no matter which endpoint it is sent to.
+"""
+from django.db.models import Q
+
+from . import search, tagging
+from .models import ProductTag
+
+
+def filter_products(products, params):
+    """
+    Apply the search query parameters to a product queryset.
+
+    Supported parameters: q, category, brand, min_price, max_price,
+    min_rating, in_stock, plus the tag filters of `tagging.filter_by_tags`
+    (tag, tag_prefix, tags_any, tags_all).
+    """
+    query = params.get('q', '')
+    category_id = params.get('category')
+    brand_id = params.get('brand')
+    min_price = params.get('min_price')
+    max_price = params.get('max_price')
+    min_rating = params.get('min_rating')
+    in_stock = params.get('in_stock', '').strip()
+
+    if query:
+        # Use the full-text index when available, otherwise fall back to a
+        # (slow) substring scan over name, description and serialized tags
+        indexed = search.filter_queryset(products, query)
+        if indexed is not None:
+            products = indexed
+        else:
+            tag_matches = ProductTag.objects.filter(
+                tag__name=tagging.normalize_tag(query)
+            ).values('product_id')
+            products = products.filter(
+                Q(name__icontains=query) |
+                Q(description__icontains=query) |
+                Q(id__in=tag_matches)  # Exact tag match through the tag index
+            )
+
+    if category_id:
+        products = products.filter(category_id=category_id)
+
+    if brand_id:
+        products = products.filter(brand_id=brand_id)
+
+    if min_price:
+        products = products.filter(price__gte=min_price)
+
+    if max_price:
+        products = products.filter(price__lte=max_price)
+
+    if min_rating:
+        products = products.filter(rating__gte=min_rating)
+
+    # Blank like the other filters: cache keys drop blank values
+    # (caching.normalize_query), so it must not filter either
+    if in_stock:
+        products = products.filter(in_stock=in_stock.lower() == 'true')
+
+    return tagging.filter_by_tags(products, params)
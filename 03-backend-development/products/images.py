@@ -0,0 +1,236 @@
+"""
+Resized variants of uploaded images.
+
+Product.thumbnail, ProductImage.image, Category.image and Brand.logo are
+stored as uploaded, often several megabytes for a 160 pixel wide tile.
+Once an upload is committed, `schedule` hands the file to a process pool
+that writes a copy per width in PRODUCTS_IMAGE_VARIANT_WIDTHS (never
+wider than the original) and per format in PRODUCTS_IMAGE_VARIANT_FORMATS,
+then stores their names in the model's `<field>_variants` JSON field.
+Resizing and encoding are CPU bound, so they run outside the request
+threads once PRODUCTS_IMAGE_WORKERS is set to a pool size. It defaults to
+0, which runs them inline at commit: a pool of worker processes must be
+enabled explicitly.
+
+Variant names are derived from a hash of the source bytes and the
+encoder options, `variants/3f/3f9a...-320w.webp`: the same picture
+uploaded twice (or shared by several products) reuses the files already
+there, and running the pipeline again only writes what is missing.
+Serializers expose the variants as `srcset` strings per MIME type.
+"""
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import django
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .caching import bump_version
+from .models import Brand, Category, Product, ProductImage
+
+logger = logging.getLogger(__name__)
+
+# Model -> name of its uploaded image field
+IMAGE_FIELDS = {
+    Product: 'thumbnail',
+    ProductImage: 'image',
+    Category: 'image',
+    Brand: 'logo',
+}
+
+# Format -> (Pillow format, MIME type, save options)
+ENCODERS = {
+    'webp': ('WEBP', 'image/webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'image/jpeg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+_executor = None
+_executor_pid = None
+
+
+def variants_field(field):
+    return f'{field}_variants'
+
+
+def variant_widths(source_width):
+    """Configured widths below the original, plus the original if it is smaller than the largest"""
+    configured = sorted(getattr(settings, 'PRODUCTS_IMAGE_VARIANT_WIDTHS', (160, 320, 640, 1280)))
+    widths = [width for width in configured if width < source_width]
+    if source_width <= configured[-1]:
+        widths.append(source_width)
+    return widths
+
+
+def variant_formats():
+    return [fmt for fmt in getattr(settings, 'PRODUCTS_IMAGE_VARIANT_FORMATS', ('webp', 'jpeg'))
+            if fmt in ENCODERS]
+
+
+def content_key(data):
+    """Hash of the source bytes; changing the encoder options renames every variant"""
+    digest = hashlib.sha256(data)
+    digest.update(json.dumps(ENCODERS, sort_keys=True).encode())
+    return digest.hexdigest()[:32]
+
+
+def variant_name(key, width, fmt):
+    directory = getattr(settings, 'PRODUCTS_IMAGE_VARIANTS_DIR', 'variants')
+    return f'{directory}/{key[:2]}/{key}-{width}w.{fmt}'
+
+
+def _encode(image, fmt):
+    pillow_format, _, options = ENCODERS[fmt]
+    has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+    if fmt == 'jpeg' and has_alpha:
+        # JPEG has no alpha channel: flatten onto white
+        rgba = image.convert('RGBA')
+        image = Image.new('RGB', rgba.size, (255, 255, 255))
+        image.paste(rgba, mask=rgba.getchannel('A'))
+    elif image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+    stream = io.BytesIO()
+    image.save(stream, pillow_format, **options)
+    return stream.getvalue()
+
+
+def _save(storage, name, data):
+    saved = storage.save(name, ContentFile(data))
+    if saved != name:
+        # Another worker wrote the same variant meanwhile; keep theirs
+        storage.delete(saved)
+
+
+def generate_variants(data, storage=None):
+    """
+    Write the missing variants of the image bytes `data`.
+
+    Returns {format: [[width, name], ...]} with widths in ascending order.
+    """
+    storage = storage or default_storage
+    key = content_key(data)
+    formats = variant_formats()
+    with Image.open(io.BytesIO(data)) as source:
+        source = ImageOps.exif_transpose(source)
+        widths = variant_widths(source.width)
+        variants = {fmt: [] for fmt in formats}
+        for width in widths:
+            names = {fmt: variant_name(key, width, fmt) for fmt in formats}
+            missing = [fmt for fmt, name in names.items() if not storage.exists(name)]
+            if missing:
+                height = max(1, round(source.height * width / source.width))
+                resized = source if width == source.width else source.resize(
+                    (width, height), Image.Resampling.LANCZOS, reducing_gap=3.0,
+                )
+                for fmt in missing:
+                    _save(storage, names[fmt], _encode(resized, fmt))
+            for fmt, name in names.items():
+                variants[fmt].append([width, name])
+    return variants
+
+
+def build_variants(name):
+    """Process pool task: variants of the stored file `name`"""
+    with default_storage.open(name, 'rb') as stream:
+        return {'source': name, 'formats': generate_variants(stream.read())}
+
+
+def _changes(model, field, variants):
+    """
+    update() values saving `variants`. update() skips auto_now, so
+    updated_at is stamped here to keep conditional GET validators moving.
+    """
+    changes = {variants_field(field): variants}
+    if any(f.name == 'updated_at' for f in model._meta.concrete_fields):
+        changes['updated_at'] = timezone.now()
+    return changes
+
+
+def store_variants(model, pk, field, variants):
+    """Save the variants unless the image was replaced meanwhile"""
+    updated = model._default_manager.filter(pk=pk, **{field: variants['source']}).update(
+        **_changes(model, field, variants)
+    )
+    if updated:
+        bump_version(model._meta.model_name)
+    return updated
+
+
+def _finished(model, pk, field, caller, future):
+    try:
+        store_variants(model, pk, field, future.result())
+    except Exception:
+        logger.exception('Image variants failed for %s %s', model._meta.label, pk)
+    finally:
+        # Done callbacks run on the pool's result thread, which has its own connections
+        if threading.get_ident() != caller:
+            connections.close_all()
+
+
+def get_executor():
+    """The process pool of this process, created on first use"""
+    global _executor, _executor_pid
+    if _executor is None or _executor_pid != os.getpid():
+        _executor = ProcessPoolExecutor(
+            max_workers=getattr(settings, 'PRODUCTS_IMAGE_WORKERS', 0),
+            initializer=django.setup,
+        )
+        _executor_pid = os.getpid()
+    return _executor
+
+
+def submit(model, pk, field, name):
+    """Generate the variants of `name` in the pool (or inline) and store them"""
+    if not getattr(settings, 'PRODUCTS_IMAGE_WORKERS', 0):
+        try:
+            store_variants(model, pk, field, build_variants(name))
+        except Exception:
+            logger.exception('Image variants failed for %s %s', model._meta.label, pk)
+        return
+    future = get_executor().submit(build_variants, name)
+    future.add_done_callback(partial(_finished, model, pk, field, threading.get_ident()))
+
+
+def schedule(instance, using='default'):
+    """Queue variant generation for a saved instance whose image changed"""
+    model = type(instance)
+    field = IMAGE_FIELDS[model]
+    name = getattr(instance, field).name
+    variants = getattr(instance, variants_field(field))
+    if not name:
+        if variants:
+            # Image removed: drop the stale variants (the files may be shared)
+            setattr(instance, variants_field(field), {})
+            model._default_manager.using(using).filter(pk=instance.pk).update(**_changes(model, field, {}))
+        return
+    if variants.get('source') == name:
+        return
+    transaction.on_commit(partial(submit, model, instance.pk, field, name), using=using)
+
+
+def srcset(name, variants, request=None):
+    """
+    {MIME type: srcset string} of the variants of the image `name`, or
+    None while they are missing or describe a previous image.
+    """
+    if not name or not variants or variants.get('source') != name:
+        return None
+    result = {}
+    for fmt, entries in variants['formats'].items():
+        candidates = []
+        for width, variant in entries:
+            url = default_storage.url(variant)
+            if request is not None:
+                url = request.build_absolute_uri(url)
+            candidates.append(f'{url} {width}w')
+        result[ENCODERS[fmt][1]] = ', '.join(candidates)
+    return result
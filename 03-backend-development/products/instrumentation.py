@@ -0,0 +1,245 @@
+"""
+Per-request timing and SQL instrumentation.
+
+`ServerTimingMiddleware` collects, for every request:
+
+- the number of SQL queries and the time spent in the database, through
+  an execute wrapper installed on every connection for the request
+- the time spent serializing (`timed('serialize')` around serializer
+  output) and rendering the response body
+- repeated SQL shapes: the same statement run many times with different
+  parameters is the signature of an N+1 query, and is logged as a warning
+
+The figures are sent back in a `Server-Timing` header (shown by browser
+dev tools) and logged as one JSON line per request on the
+'products.instrumentation' logger. SQL run inside a timed block is
+subtracted from it, so db, serialize and render never overlap.
+"""
+import contextvars
+import json
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, asynccontextmanager, contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_metrics = contextvars.ContextVar('request_metrics', default=None)
+
+# Parameter lists and inlined numbers (LIMIT/OFFSET, savepoint ids) vary
+# between otherwise identical statements
+_PLACEHOLDER_LIST_RE = re.compile(r'\((?:\s*%s\s*,)*\s*%s\s*\)')
+_NUMBER_RE = re.compile(r'\b\d+\b')
+
+
+def sql_shape(sql):
+    """Statement text with parameter lists and numbers collapsed"""
+    return _NUMBER_RE.sub('N', _PLACEHOLDER_LIST_RE.sub('(...)', sql))
+
+
+class RequestMetrics:
+    """Counters for one request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql_time = 0.0
+        self.shapes = Counter()
+        self.timings = Counter()
+        self.active = set()
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - started
+            self.queries += 1
+            self.shapes[sql_shape(sql)] += 1
+
+    def start(self, name):
+        """Start timing `name`; returns the token for stop(), None if already running"""
+        if name in self.active:
+            return None
+        self.active.add(name)
+        return time.perf_counter(), self.sql_time
+
+    def stop(self, name, token):
+        if token is None:
+            return
+        started, sql_before = token
+        self.active.discard(name)
+        self.timings[name] += time.perf_counter() - started - (self.sql_time - sql_before)
+
+    def repeated_queries(self, threshold):
+        """(count, shape) of the statements run at least `threshold` times"""
+        return [(count, shape) for shape, count in self.shapes.most_common() if count >= threshold]
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+
+def current_metrics():
+    """Metrics of the request being handled, or None outside collect()"""
+    return _metrics.get()
+
+
+@contextmanager
+def execute_wrappers(wrapper):
+    """Install `wrapper` on every database connection of this thread"""
+    with ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(wrapper))
+        yield
+
+
+@asynccontextmanager
+async def aexecute_wrappers(wrapper):
+    """
+    execute_wrappers() for async code. Connections are per thread and the
+    async ORM queries from a sync_to_async thread, so the wrappers are
+    installed (and removed) there rather than on the event loop's.
+    """
+    stack = ExitStack()
+    await sync_to_async(stack.enter_context)(execute_wrappers(wrapper))
+    try:
+        yield
+    finally:
+        await sync_to_async(stack.close)()
+
+
+@contextmanager
+def collect():
+    """Record SQL and timings of everything run inside the block"""
+    metrics = RequestMetrics()
+    token = _metrics.set(metrics)
+    try:
+        with execute_wrappers(metrics.execute_wrapper):
+            yield metrics
+    finally:
+        _metrics.reset(token)
+
+
+@asynccontextmanager
+async def acollect():
+    """collect() for async code"""
+    metrics = RequestMetrics()
+    token = _metrics.set(metrics)
+    try:
+        async with aexecute_wrappers(metrics.execute_wrapper):
+            yield metrics
+    finally:
+        _metrics.reset(token)
+
+
+@contextmanager
+def timed(name):
+    """
+    Add the block's duration to the `name` timing of the current request.
+
+    SQL run inside the block is excluded, and nested blocks with the same
+    name (nested serializers) are only counted once.
+    """
+    metrics = _metrics.get()
+    token = metrics.start(name) if metrics is not None else None
+    try:
+        yield
+    finally:
+        if token is not None:
+            metrics.stop(name, token)
+
+
+class TimedRepresentationMixin:
+    """Count DRF serializer output as 'serialize' time"""
+
+    def to_representation(self, instance):
+        with timed('serialize'):
+            return super().to_representation(instance)
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 2)
+
+
+class ServerTimingMiddleware:
+    """
+    Add a Server-Timing header and log a summary line for each request.
+
+    Disabled with PRODUCTS_REQUEST_INSTRUMENTATION = False; repeated SQL
+    shapes are reported from PRODUCTS_N_PLUS_ONE_THRESHOLD executions.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not getattr(settings, 'PRODUCTS_REQUEST_INSTRUMENTATION', True):
+            return self.get_response(request)
+        with collect() as metrics:
+            response = self.get_response(request)
+            total = metrics.elapsed()
+        self.report(request, response, metrics, total)
+        return response
+
+    async def __acall__(self, request):
+        if not getattr(settings, 'PRODUCTS_REQUEST_INSTRUMENTATION', True):
+            return await self.get_response(request)
+        async with acollect() as metrics:
+            response = await self.get_response(request)
+            total = metrics.elapsed()
+        self.report(request, response, metrics, total)
+        return response
+
+    def process_template_response(self, request, response):
+        # Called right before a DRF/template response is rendered; the
+        # render time ends in the post-render callback
+        metrics = current_metrics()
+        if metrics is not None:
+            token = metrics.start('render')
+            response.add_post_render_callback(lambda rendered: metrics.stop('render', token))
+        return response
+
+    def report(self, request, response, metrics, total):
+        serialize = metrics.timings['serialize']
+        render = metrics.timings['render']
+        app = max(total - metrics.sql_time - serialize - render, 0.0)
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={_ms(metrics.sql_time)};desc="{metrics.queries} queries"',
+            f'serialize;dur={_ms(serialize)}',
+            f'render;dur={_ms(render)}',
+            f'app;dur={_ms(app)}',
+            f'total;dur={_ms(total)}',
+        ])
+
+        repeated = []
+        threshold = getattr(settings, 'PRODUCTS_N_PLUS_ONE_THRESHOLD', 5)
+        if threshold:
+            repeated = metrics.repeated_queries(threshold)
+            for count, shape in repeated:
+                logger.warning(
+                    'Possible N+1 query on %s %s: %d executions of %s',
+                    request.method, request.path, count, shape,
+                )
+
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': _ms(total),
+            'db_queries': metrics.queries,
+            'db_ms': _ms(metrics.sql_time),
+            'serialize_ms': _ms(serialize),
+            'render_ms': _ms(render),
+            'repeated_queries': [{'count': count, 'sql': shape} for count, shape in repeated],
+        }))
@@ -0,0 +1,117 @@
+import io
+import json
+from datetime import datetime, timezone
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import override_settings
+
+from products import benchmarks
+
+
+class Rollback(Exception):
+    """Raised to discard the generated datasets"""
+
+
+def parse_sizes(value):
+    try:
+        sizes = sorted({int(size) for size in value.split(',') if size.strip()})
+    except ValueError:
+        raise CommandError('--sizes must be a comma separated list of integers')
+    if not sizes or sizes[0] < 1:
+        raise CommandError('--sizes must be positive')
+    return sizes
+
+
+class Command(BaseCommand):
+    help = (
+        'Run the serializer, queryset and view microbenchmarks on generated catalogs of '
+        'several sizes (rolled back afterwards), optionally comparing with a saved baseline'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,10000', help='Catalog sizes in products (default: 1000,10000)')
+        parser.add_argument('-k', '--filter', help='Only run benchmarks whose name contains this')
+        parser.add_argument('--max-time', type=float, default=0.5, help='Seconds spent per benchmark')
+        parser.add_argument('--min-rounds', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0, help='Seed of the generated catalogs')
+        parser.add_argument('--save', metavar='PATH', help='Write the results as JSON')
+        parser.add_argument('--compare', metavar='PATH', help='Baseline JSON to compare with')
+        parser.add_argument('--threshold', type=float, default=10.0,
+                            help='Percent slowdown that counts as a regression (default: 10)')
+        parser.add_argument('--stat', choices=benchmarks.STATS, default='min',
+                            help='Statistic compared with the baseline (default: min, the least noisy)')
+
+    def handle(self, *args, **options):
+        sizes = parse_sizes(options['sizes'])
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare']) as stream:
+                    baseline = json.load(stream)
+            except (OSError, ValueError) as exc:
+                raise CommandError(f'Cannot read baseline {options["compare"]}: {exc}')
+
+        results = []
+        # Measure the code, not the response cache; the test client always
+        # sends 'Host: testserver'
+        with override_settings(PRODUCTS_RESPONSE_CACHE_TIMEOUT=0, ALLOWED_HOSTS=['testserver']):
+            try:
+                with transaction.atomic():
+                    for size in sizes:
+                        results += self.run_size(size, options)
+                    raise Rollback
+            except Rollback:
+                pass
+
+        report = {
+            'datetime': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'machine_info': benchmarks.machine_info(),
+            'benchmarks': results,
+        }
+        if options['save']:
+            with open(options['save'], 'w') as stream:
+                json.dump(report, stream, indent=2)
+                stream.write('\n')
+            self.stdout.write(f'Saved {len(results)} results to {options["save"]}')
+        if baseline is not None:
+            self.compare(baseline, report, options['threshold'] / 100, options['stat'])
+
+    def run_size(self, size, options):
+        self.stdout.write(f'Generating a catalog of {size} products...')
+        call_command('generate_catalog', products=size, seed=options['seed'], workers=1,
+                     clear=True, stdout=io.StringIO())
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+        dataset = benchmarks.Dataset(size)
+        results = []
+        for result in benchmarks.run_suite(dataset, options['filter'], options['max_time'],
+                                           options['min_rounds']):
+            stats = result['stats']
+            self.stdout.write(
+                f"{result['name']:<38} median {stats['median'] * 1000:9.3f} ms  "
+                f"min {stats['min'] * 1000:9.3f} ms  stddev {stats['stddev'] * 1000:8.3f} ms  "
+                f"{stats['ops']:10.1f} ops/s  ({stats['rounds']} x {stats['iterations']})"
+            )
+            results.append(result)
+        return results
+
+    def compare(self, baseline, report, threshold, stat):
+        self.stdout.write(f'\nComparison with the baseline ({stat}, threshold {threshold:.0%}):')
+        regressions = []
+        for name, before, after, change, regressed in benchmarks.compare(baseline, report, threshold, stat):
+            if change is None:
+                self.stdout.write(f'{name:<38} {after * 1000:9.3f} ms  (new)')
+                continue
+            line = f'{name:<38} {before * 1000:9.3f} -> {after * 1000:9.3f} ms  {change:+8.1%}'
+            if regressed:
+                regressions.append(name)
+                self.stdout.write(self.style.ERROR(f'{line}  REGRESSION'))
+            else:
+                self.stdout.write(line)
+        if regressions:
+            raise CommandError(f'{len(regressions)} benchmark(s) regressed: {", ".join(regressions)}')
+        self.stdout.write(self.style.SUCCESS('No regressions'))
@@ -0,0 +1,94 @@
+import asyncio
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import AsyncClient, Client, override_settings
+
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare concurrent throughput of the sync (WSGI) catalog endpoints with their '
+        '/api/async/ (ASGI) variants, driving both request handlers in-process'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint and path')
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--q', default='pro', help='Search query used for the search endpoints')
+
+    def handle(self, *args, **options):
+        product_id = Product.objects.values_list('id', flat=True).first()
+        if product_id is None:
+            raise CommandError('No products; run populate_sample_data.py or import_catalog first')
+        if options['requests'] < 1 or options['concurrency'] < 1:
+            raise CommandError('--requests and --concurrency must be positive')
+
+        endpoints = [
+            ('list', '/api/products/', '/api/async/products/'),
+            ('detail', f'/api/products/{product_id}/', f'/api/async/products/{product_id}/'),
+            ('search', f'/api/search/?q={options["q"]}', f'/api/async/search/?q={options["q"]}'),
+        ]
+        # Measure the views, not the response cache; the test clients always
+        # send 'Host: testserver'
+        with override_settings(PRODUCTS_RESPONSE_CACHE_TIMEOUT=0, ALLOWED_HOSTS=['testserver']):
+            for name, sync_url, async_url in endpoints:
+                wsgi = self.run_wsgi(sync_url, options['requests'], options['concurrency'])
+                asgi = asyncio.run(self.run_asgi(async_url, options['requests'], options['concurrency']))
+                self.report(name, 'wsgi', wsgi)
+                self.report(name, 'asgi', asgi)
+                self.stdout.write(f'  asgi/wsgi throughput: {wsgi[0] / asgi[0]:.2f}x')
+
+    def run_wsgi(self, url, total, concurrency):
+        local = threading.local()
+
+        def request(_):
+            if not hasattr(local, 'client'):
+                local.client = Client()
+            started = time.perf_counter()
+            response = local.client.get(url)
+            elapsed = time.perf_counter() - started
+            if response.status_code != 200:
+                raise CommandError(f'GET {url} returned {response.status_code}')
+            return elapsed
+
+        def close_connections(_):
+            connections.close_all()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            latencies = list(pool.map(request, range(total)))
+            # Every worker thread opened its own database connection
+            list(pool.map(close_connections, range(concurrency)))
+        return time.perf_counter() - started, latencies
+
+    async def run_asgi(self, url, total, concurrency):
+        client = AsyncClient()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def request():
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.get(url)
+                elapsed = time.perf_counter() - started
+            if response.status_code != 200:
+                raise CommandError(f'GET {url} returned {response.status_code}')
+            return elapsed
+
+        started = time.perf_counter()
+        latencies = await asyncio.gather(*[request() for _ in range(total)])
+        return time.perf_counter() - started, latencies
+
+    def report(self, name, handler, result):
+        elapsed, latencies = result
+        latencies = sorted(latencies)
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        self.stdout.write(
+            f'{name:<7} {handler}: {len(latencies) / elapsed:8.1f} req/s  '
+            f'p50 {statistics.median(latencies) * 1000:7.2f} ms  p95 {p95 * 1000:7.2f} ms'
+        )
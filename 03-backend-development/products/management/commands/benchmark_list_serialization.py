@@ -0,0 +1,105 @@
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+
+from products.models import Category, Brand, Product
+from products.serializers import FastProductListSerializer, ProductListSerializer
+
+
+class Rollback(Exception):
+    """Raised to discard the benchmark rows"""
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare ProductListSerializer with FastProductListSerializer on generated '
+        'rows (rolled back afterwards) and check the JSON output is identical'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100, help='Rows per page')
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options['rows'], options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def create_rows(self, count):
+        category = Category.objects.create(name='Benchmark category')
+        brand = Brand.objects.create(name='Benchmark brand')
+        Product.objects.bulk_create([
+            Product(
+                name=f'Benchmark product {i}',
+                description='Benchmark description ' * 10,
+                price=Decimal('19.99') + i,
+                original_price=Decimal('29.99') + i if i % 2 else None,
+                category=category, brand=brand, stock_quantity=i,
+                rating=Decimal('4.25'), review_count=i,
+                thumbnail=f'products/thumbnails/{i}.jpg' if i % 10 == 0 else '',
+                tags=['benchmark', f'tag-{i % 10}'],
+            )
+            for i in range(count)
+        ])
+        return Product.objects.filter(category=category).select_related('category', 'brand')
+
+    def run(self, rows, repeat):
+        queryset = self.create_rows(rows)
+        request = RequestFactory(SERVER_NAME='localhost').get('/api/products/')
+        renderer = JSONRenderer()
+        context = {'request': request}
+
+        # Each path: (fetch rows, serialize, render)
+        paths = {
+            'ProductListSerializer': (
+                lambda: list(queryset.all()),
+                lambda page: ProductListSerializer(page, many=True, context=context).data,
+            ),
+            'FastProductListSerializer': (
+                lambda: list(FastProductListSerializer.get_rows(queryset)),
+                lambda page: FastProductListSerializer(page, many=True, context=context).data,
+            ),
+        }
+
+        outputs = {
+            name: renderer.render(serialize(fetch())) for name, (fetch, serialize) in paths.items()
+        }
+        if len(set(outputs.values())) != 1:
+            raise CommandError('Fast serializer output differs from ProductListSerializer')
+
+        timings = {}
+        for name, (fetch, serialize) in paths.items():
+            best = {'fetch': float('inf'), 'serialize': float('inf'), 'render': float('inf')}
+            for _ in range(repeat):
+                start = time.perf_counter()
+                page = fetch()
+                fetched = time.perf_counter()
+                data = serialize(page)
+                serialized = time.perf_counter()
+                renderer.render(data)
+                rendered = time.perf_counter()
+                best['fetch'] = min(best['fetch'], fetched - start)
+                best['serialize'] = min(best['serialize'], serialized - fetched)
+                best['render'] = min(best['render'], rendered - serialized)
+            timings[name] = best
+            self.stdout.write(
+                f"{name:26} fetch {best['fetch'] * 1000:7.2f} ms  "
+                f"serialize {best['serialize'] * 1000:7.2f} ms  "
+                f"render {best['render'] * 1000:7.2f} ms  "
+                f"total {sum(best.values()) * 1000:7.2f} ms"
+            )
+
+        regular = timings['ProductListSerializer']
+        fast = timings['FastProductListSerializer']
+        self.stdout.write(self.style.SUCCESS(
+            f'Output identical for {rows} rows (best of {repeat}); '
+            f"fetch+serialize x{(regular['fetch'] + regular['serialize']) / (fast['fetch'] + fast['serialize']):.1f}, "
+            f'end-to-end x{sum(regular.values()) / sum(fast.values()):.1f}'
+        ))
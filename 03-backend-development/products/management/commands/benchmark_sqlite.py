@@ -0,0 +1,127 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections, transaction
+from django.db.models import F
+
+from products.models import Product, Review
+
+
+class Command(BaseCommand):
+    help = (
+        'Mixed read/write throughput on a copy of the database: SQLite defaults '
+        '(rollback journal) against the tuned connection settings (WAL, mmap, busy timeout)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=5.0, help='Duration of each run')
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--writers', type=int, default=2)
+
+    def handle(self, *args, **options):
+        source = settings.DATABASES['default']
+        if source['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError('This benchmark only applies to SQLite')
+        product_ids = list(Product.objects.using('default').values_list('id', flat=True)[:100])
+        if not product_ids:
+            raise CommandError('No products; run populate_sample_data.py or import_catalog first')
+
+        tuned = source.get('OPTIONS', {})
+        profiles = [
+            ('defaults', {'init_command': 'PRAGMA journal_mode=DELETE'}),
+            ('tuned', tuned),
+        ]
+        workdir = tempfile.mkdtemp(prefix='benchmark_sqlite_')
+        try:
+            for name, db_options in profiles:
+                path = os.path.join(workdir, f'{name}.sqlite3')
+                # The backup API copies a consistent snapshot, WAL included
+                with sqlite3.connect(source['NAME']) as src, sqlite3.connect(path) as dest:
+                    src.backup(dest)
+                alias = f'benchmark_{name}'
+                connections.settings[alias] = {**source, 'NAME': path, 'OPTIONS': db_options}
+                try:
+                    result = self.run(alias, product_ids, options)
+                finally:
+                    del connections.settings[alias]
+                self.report(name, options['seconds'], result)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    def run(self, alias, product_ids, options):
+        deadline = time.monotonic() + options['seconds']
+        lock = threading.Lock()
+        totals = {'reads': 0, 'writes': 0, 'errors': 0, 'read_latencies': []}
+
+        def reader(worker):
+            reads, latencies, errors = 0, [], 0
+            products = Product.objects.using(alias).select_related('category', 'brand')
+            while time.monotonic() < deadline:
+                product_id = product_ids[(worker + reads) % len(product_ids)]
+                started = time.perf_counter()
+                try:
+                    # A search page: filtered count plus the first rows
+                    page = products.filter(rating__gte=1).order_by('-rating', '-created_at')
+                    page.count()
+                    list(page[:20].values('id', 'name', 'price', 'category__name'))
+                    list(Review.objects.using(alias).filter(product_id=product_id)[:5])
+                except OperationalError:
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - started)
+                reads += 1
+            connections[alias].close()
+            with lock:
+                totals['reads'] += reads
+                totals['errors'] += errors
+                totals['read_latencies'] += latencies
+
+        def writer(worker):
+            writes, errors = 0, 0
+            while time.monotonic() < deadline:
+                product_id = product_ids[(worker * 7 + writes) % len(product_ids)]
+                try:
+                    # A review post: insert plus a product counter update in one
+                    # transaction (bulk_create skips the signals, which write to
+                    # the configured databases)
+                    with transaction.atomic(using=alias):
+                        Review.objects.using(alias).bulk_create([Review(
+                            product_id=product_id, user_name='Benchmark',
+                            user_email='benchmark@example.com', rating=4,
+                            title='Benchmark', comment=uuid.uuid4().hex,
+                        )])
+                        Product.objects.using(alias).filter(pk=product_id).update(
+                            review_count=F('review_count') + 1
+                        )
+                except OperationalError:
+                    errors += 1
+                    continue
+                writes += 1
+            connections[alias].close()
+            with lock:
+                totals['writes'] += writes
+                totals['errors'] += errors
+
+        threads = [threading.Thread(target=reader, args=(i,)) for i in range(options['readers'])]
+        threads += [threading.Thread(target=writer, args=(i,)) for i in range(options['writers'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return totals
+
+    def report(self, name, seconds, totals):
+        latencies = sorted(totals['read_latencies'])
+        p95 = latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0
+        self.stdout.write(
+            f'{name:<8} reads {totals["reads"] / seconds:8.1f}/s  '
+            f'writes {totals["writes"] / seconds:7.1f}/s  '
+            f'read p95 {p95:7.2f} ms  lock errors {totals["errors"]}'
+        )
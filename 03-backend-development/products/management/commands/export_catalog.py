@@ -0,0 +1,42 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.http import QueryDict
+
+from products import exporting
+
+
+class Command(BaseCommand):
+    help = 'Stream the product catalog as NDJSON (one product per line)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('-o', '--output', default='-',
+                            help="Output file, or '-' for stdout (default)")
+        parser.add_argument('--gzip', action='store_true', help='Gzip compress the output')
+        parser.add_argument('--filter', action='append', default=[], metavar='PARAM=VALUE',
+                            help='Search filter, e.g. --filter q=phone --filter in_stock=true')
+        parser.add_argument('--chunk-size', type=int, default=exporting.DEFAULT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        params = QueryDict(mutable=True)
+        for item in options['filter']:
+            name, sep, value = item.partition('=')
+            if not sep or not name:
+                raise CommandError(f'Invalid filter {item!r}, expected PARAM=VALUE')
+            params.appendlist(name, value)
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be positive')
+
+        chunks = exporting.export_products(
+            params, compress=options['gzip'], chunk_size=options['chunk_size']
+        )
+        if options['output'] == '-':
+            self.write(sys.stdout.buffer, chunks)
+            sys.stdout.buffer.flush()
+        else:
+            with open(options['output'], 'wb') as stream:
+                self.write(stream, chunks)
+
+    def write(self, stream, chunks):
+        for chunk in chunks:
+            stream.write(chunk)
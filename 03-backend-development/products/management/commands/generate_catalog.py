@@ -0,0 +1,176 @@
+"""
+Synthetic benchmark catalog.
+
+Builds a reproducible catalog of any size (see `products.synthetic` for
+the distributions). SQLite has a single writer, so the work is split the
+other way round: a process pool generates chunks of products and reviews
+and turns them into database parameters, while the main process only
+runs one multi-row insert per table and chunk, each chunk in its own
+transaction.
+
+Bulk inserts do not send model signals, so the command writes the tag
+links and search index rows itself and bumps the response cache
+versions at the end.
+"""
+import multiprocessing
+import time
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+
+from products import search, synthetic
+from products.caching import bump_version
+from products.models import Brand, Category, Product, ProductImage, ProductTag, Review, Tag
+from products.tagging import normalize_tags
+
+# Set in each worker by `init_worker`
+_state = {}
+
+
+def _insert_sql(model, fields, connection):
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(field.column) for field in fields)
+    placeholders = ', '.join(['%s'] * len(fields))
+    return f'INSERT INTO {quote(model._meta.db_table)} ({columns}) VALUES ({placeholders})'
+
+
+def _fields(model):
+    return [field for field in model._meta.concrete_fields if not field.auto_created]
+
+
+def init_worker(options, categories, brands, tag_ids):
+    django.setup()
+    _state.update(options=options, categories=categories, brands=brands, tag_ids=tag_ids)
+
+
+def build_chunk(chunk):
+    """Generate one (index, size) chunk and convert it to insert parameters"""
+    options = _state['options']
+    connection = connections['default']
+    products, reviews = synthetic.generate_chunk(
+        options['seed'], *chunk, _state['categories'], _state['brands'], options['avg_reviews'],
+    )
+
+    def params(model, rows):
+        fields = _fields(model)
+        return [
+            tuple(field.get_db_prep_save(row[field.attname], connection) for field in fields)
+            for row in rows
+        ]
+
+    tag_ids = _state['tag_ids']
+    return {
+        'products': params(Product, products),
+        'reviews': params(Review, reviews),
+        'tags': [
+            (product['id'].hex, tag_ids[name])
+            for product in products
+            for name in sorted(normalize_tags(product['tags']))
+        ],
+        'search': [
+            (product['id'], product['name'], product['description'], product['tags'])
+            for product in products
+        ],
+    }
+
+
+class Command(BaseCommand):
+    help = 'Generate a deterministic synthetic catalog (products, reviews, tags) for benchmarks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100_000)
+        parser.add_argument('--avg-reviews', type=float, default=10.0,
+                            help='Mean reviews per product; the distribution is heavy-tailed')
+        parser.add_argument('--categories', type=int, default=50)
+        parser.add_argument('--brands', type=int, default=500)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count(),
+                            help='Generator processes (1 generates inline)')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Products per transaction')
+        parser.add_argument('--clear', action='store_true',
+                            help='Delete existing products, reviews, categories and brands first')
+
+    def handle(self, *args, **options):
+        for name in ('products', 'categories', 'brands', 'workers', 'chunk_size'):
+            if options[name] < 1:
+                raise CommandError(f'--{name.replace("_", "-")} must be positive')
+        if options['avg_reviews'] < 0:
+            raise CommandError('--avg-reviews must not be negative')
+
+        if options['clear']:
+            self.clear()
+        elif Product.objects.using('default').exists():
+            raise CommandError('The catalog is not empty; pass --clear to replace it')
+
+        categories = self.create_named(Category, synthetic.category_names(options['categories']))
+        brands = self.create_named(Brand, synthetic.brand_names(options['brands'], options['seed']))
+        Tag.objects.bulk_create([Tag(name=name) for name in synthetic.all_tags()], ignore_conflicts=True)
+        tag_ids = dict(Tag.objects.using('default').values_list('name', 'id'))
+
+        total = options['products']
+        size = options['chunk_size']
+        chunks = [(index, min(size, total - index * size)) for index in range((total + size - 1) // size)]
+        worker_args = (
+            {'seed': options['seed'], 'avg_reviews': options['avg_reviews']},
+            categories, brands, tag_ids,
+        )
+
+        self.started = time.monotonic()
+        self.products = self.reviews = 0
+        if options['workers'] == 1:
+            init_worker(*worker_args)
+            self.write_all(build_chunk(chunk) for chunk in chunks)
+        else:
+            # Forked workers must not share the parent's database connections
+            connections.close_all()
+            with multiprocessing.Pool(options['workers'], init_worker, worker_args) as pool:
+                self.write_all(pool.imap(build_chunk, chunks))
+
+        for model_name in ('category', 'brand', 'product', 'review'):
+            bump_version(model_name)
+        elapsed = time.monotonic() - self.started
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {self.products} products and {self.reviews} reviews in {elapsed:.1f}s '
+            f'({(self.products + self.reviews) / max(elapsed, 1e-9):.0f} rows/sec)'
+        ))
+
+    def clear(self):
+        connection = connections['default']
+        with transaction.atomic(using='default'), connection.cursor() as cursor:
+            # Raw deletes: the ORM would collect every cascaded row first
+            for model in (ProductTag, ProductImage, Review, Product, Category, Brand):
+                cursor.execute(f'DELETE FROM {connection.ops.quote_name(model._meta.db_table)}')
+            search.rebuild_index(Product.objects.none(), using='default')
+
+    def create_named(self, model, names):
+        """
+        Create the named rows and return (ids, names, Zipf weights).
+
+        The order of `names` is the popularity rank.
+        """
+        model.objects.bulk_create([model(name=name) for name in names], ignore_conflicts=True)
+        ids = dict(model.objects.using('default').filter(name__in=names).values_list('name', 'id'))
+        return [ids[name] for name in names], names, synthetic.zipf_weights(len(names))
+
+    def write_all(self, chunks):
+        connection = connections['default']
+        product_sql = _insert_sql(Product, _fields(Product), connection)
+        review_sql = _insert_sql(Review, _fields(Review), connection)
+        tag_fields = [ProductTag._meta.get_field('product'), ProductTag._meta.get_field('tag')]
+        tag_sql = _insert_sql(ProductTag, tag_fields, connection)
+
+        for chunk in chunks:
+            # The products of a chunk are new, so the index needs no deletes
+            with transaction.atomic(using='default'), connection.cursor() as cursor:
+                cursor.executemany(product_sql, chunk['products'])
+                cursor.executemany(review_sql, chunk['reviews'])
+                cursor.executemany(tag_sql, chunk['tags'])
+                search.index_products(chunk['search'], using='default', replace=False)
+            self.products += len(chunk['products'])
+            self.reviews += len(chunk['reviews'])
+            elapsed = time.monotonic() - self.started
+            self.stdout.write(
+                f'{self.products} products, {self.reviews} reviews '
+                f'({(self.products + self.reviews) / max(elapsed, 1e-9):.0f} rows/sec)'
+            )
@@ -0,0 +1,79 @@
+"""
+Backfill resized image variants.
+
+Uploads get their variants from the post-save pipeline (see
+`products.images`); this command covers images that predate it, failed
+jobs and changed PRODUCTS_IMAGE_VARIANT_* settings. Each stored file is
+processed once even when several rows share it, in a process pool, and
+variant files that already exist are kept.
+"""
+import multiprocessing
+import time
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from products import images
+
+
+def build(name):
+    """Pool task: (name, variants, error)"""
+    try:
+        return name, images.build_variants(name), None
+    except Exception as exc:
+        return name, None, f'{type(exc).__name__}: {exc}'
+
+
+class Command(BaseCommand):
+    help = 'Generate the missing resized variants of uploaded product, category and brand images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count(),
+                            help='Image processes (1 generates inline)')
+        parser.add_argument('--force', action='store_true',
+                            help='Also process images whose variants are recorded, e.g. after changing the widths')
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1:
+            raise CommandError('--workers must be positive')
+
+        jobs = {}
+        for model, field in images.IMAGE_FIELDS.items():
+            rows = (
+                model._default_manager.exclude(**{f'{field}__isnull': True}).exclude(**{field: ''})
+                .values_list('pk', field, images.variants_field(field))
+            )
+            for pk, name, variants in rows.iterator():
+                if options['force'] or variants.get('source') != name:
+                    jobs.setdefault(name, []).append((model, pk, field))
+        if not jobs:
+            self.stdout.write('All image variants are up to date')
+            return
+
+        started = time.monotonic()
+        names = sorted(jobs)
+        if options['workers'] == 1:
+            self.store_all(map(build, names), jobs)
+        else:
+            # Forked workers must not share the parent's database connections
+            connections.close_all()
+            with multiprocessing.Pool(options['workers'], django.setup) as pool:
+                self.store_all(pool.imap_unordered(build, names), jobs)
+
+        elapsed = time.monotonic() - started
+        message = f'Generated variants of {self.done} images in {elapsed:.1f}s'
+        if self.failed:
+            raise CommandError(f'{message}; {self.failed} failed')
+        self.stdout.write(self.style.SUCCESS(message))
+
+    def store_all(self, results, jobs):
+        self.done = self.failed = 0
+        for name, variants, error in results:
+            if error is not None:
+                self.failed += 1
+                self.stderr.write(f'{name}: {error}')
+                continue
+            for model, pk, field in jobs[name]:
+                images.store_variants(model, pk, field, variants)
+            self.done += 1
@@ -0,0 +1,302 @@
+"""
+Bulk catalog import.
+
+Reads products from a CSV or JSON Lines file (or stdin) one row at a time
+and writes them in batches: every batch is a single transaction with one
+`bulk_create` for new products and one `bulk_update` for existing ones,
+matched by `sku`. Categories and brands are resolved from an in-memory
+name -> id map, so a row never costs a lookup query.
+
+Bulk operations do not send model signals, so each batch refreshes the
+search index, the tag index and the response cache versions itself.
+
+CSV list columns (`tags`, `images`) are '|' separated and
+`specifications` is a JSON object; in JSON Lines every field uses its
+natural JSON type.
+"""
+import csv
+import io
+import json
+import sys
+import time
+from decimal import Decimal, InvalidOperation
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from products import search, tagging
+from products.caching import bump_version
+from products.models import Brand, Category, Product, ProductImage
+
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 'on'}
+FALSE_VALUES = {'0', 'false', 'no', 'n', 'off'}
+
+# Fields copied onto existing products by bulk_update
+UPDATE_FIELDS = [
+    'name', 'description', 'price', 'original_price', 'category', 'subcategory',
+    'brand', 'in_stock', 'stock_quantity', 'tags', 'specifications',
+    'thumbnail_url', 'updated_at',
+]
+
+
+class RowError(ValueError):
+    pass
+
+
+def _text(value, field):
+    """A string field; JSON Lines rows may hold any JSON type"""
+    if value is None:
+        return ''
+    if not isinstance(value, str):
+        raise RowError(f'{field} must be a string')
+    return value
+
+
+def _decimal(value, field, required=False):
+    if value in (None, ''):
+        if required:
+            raise RowError(f'{field} is required')
+        return None
+    try:
+        return Decimal(str(value))
+    except InvalidOperation:
+        raise RowError(f'{field} must be a number')
+
+
+def _bool(value, default=True):
+    # A blank CSV cell means the column was left empty, like a missing one
+    if value is None or value == '':
+        return default
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False
+    raise RowError(f'invalid boolean {value!r}')
+
+
+def _int(value, field):
+    if value in (None, ''):
+        return 0
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise RowError(f'{field} must be an integer')
+    if number < 0:
+        raise RowError(f'{field} must not be negative')
+    return number
+
+
+def _list(value, field):
+    if value in (None, ''):
+        return []
+    if isinstance(value, list):
+        if not all(isinstance(item, str) for item in value):
+            raise RowError(f'{field} must be a list of strings')
+        return value
+    if not isinstance(value, str):
+        raise RowError(f'{field} must be a list of strings')
+    return [item.strip() for item in value.split('|') if item.strip()]
+
+
+def _dict(value):
+    if value in (None, ''):
+        return {}
+    if isinstance(value, dict):
+        return value
+    try:
+        value = json.loads(value)
+    except ValueError:
+        raise RowError('specifications must be a JSON object')
+    if not isinstance(value, dict):
+        raise RowError('specifications must be a JSON object')
+    return value
+
+
+def read_rows(stream, fmt):
+    """Yield (line number, row dict) pairs without loading the whole file"""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield line_number, row if isinstance(row, dict) else None
+
+
+class Command(BaseCommand):
+    help = 'Import products from a CSV or JSON Lines file, upserting by sku'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV or JSON Lines file, or '-' for stdin")
+        parser.add_argument('--format', choices=['csv', 'jsonl'],
+                            help='Input format (default: guessed from the file extension)')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--create-missing', action='store_true',
+                            help='Create unknown categories and brands instead of rejecting the row')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('csv' if path.endswith('.csv') else 'jsonl')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive')
+        self.batch_size = options['batch_size']
+        self.create_missing = options['create_missing']
+
+        self.categories = dict(Category.objects.values_list('name', 'id'))
+        self.brands = dict(Brand.objects.values_list('name', 'id'))
+        self.created = self.updated = self.errors = 0
+        self.started = time.monotonic()
+
+        if path == '-':
+            self.run(io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8'), fmt)
+        else:
+            try:
+                stream = open(path, newline='', encoding='utf-8')
+            except OSError as exc:
+                raise CommandError(f'Cannot open {path}: {exc}')
+            with stream:
+                self.run(stream, fmt)
+
+        elapsed = time.monotonic() - self.started
+        total = self.created + self.updated
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {total} products ({self.created} created, {self.updated} updated, '
+            f'{self.errors} rejected) in {elapsed:.1f}s ({total / max(elapsed, 1e-9):.0f} rows/sec)'
+        ))
+
+    def run(self, stream, fmt):
+        batch = []
+        for line_number, row in read_rows(stream, fmt):
+            if row is None:
+                self.reject(line_number, 'expected a JSON object')
+                continue
+            batch.append((line_number, row))
+            if len(batch) >= self.batch_size:
+                self.write_batch(batch)
+                batch = []
+        if batch:
+            self.write_batch(batch)
+
+    def reject(self, line_number, message):
+        self.errors += 1
+        self.stderr.write(f'line {line_number}: {message}')
+
+    def resolve(self, rows, field, model, lookup):
+        """Map the category/brand names used in `rows` to ids"""
+        # Rows with a non-string name are rejected by build()
+        missing = {
+            row[field] for _, row in rows
+            if row.get(field) and isinstance(row[field], str) and row[field] not in lookup
+        }
+        if missing and self.create_missing:
+            model.objects.bulk_create([model(name=name) for name in missing], ignore_conflicts=True)
+            lookup.update(model.objects.filter(name__in=missing).values_list('name', 'id'))
+            bump_version(model._meta.model_name)
+
+    def build(self, row):
+        """Turn an input row into unsaved Product field values"""
+        name = _text(row.get('name'), 'name').strip()
+        if not name:
+            raise RowError('name is required')
+        category_id = self.categories.get(_text(row.get('category'), 'category'))
+        if category_id is None:
+            raise RowError(f'unknown category {row.get("category")!r}')
+        brand_id = self.brands.get(_text(row.get('brand'), 'brand'))
+        if brand_id is None:
+            raise RowError(f'unknown brand {row.get("brand")!r}')
+        return {
+            'sku': _text(row.get('sku'), 'sku').strip() or None,
+            'name': name,
+            'description': _text(row.get('description'), 'description'),
+            'price': _decimal(row.get('price'), 'price', required=True),
+            'original_price': _decimal(row.get('original_price'), 'original_price'),
+            'category_id': category_id,
+            'subcategory': _text(row.get('subcategory'), 'subcategory'),
+            'brand_id': brand_id,
+            'in_stock': _bool(row.get('in_stock')),
+            'stock_quantity': _int(row.get('stock_quantity'), 'stock_quantity'),
+            'tags': _list(row.get('tags'), 'tags'),
+            'specifications': _dict(row.get('specifications')),
+            'thumbnail_url': _text(row.get('thumbnail_url'), 'thumbnail_url') or None,
+        }
+
+    def write_batch(self, rows):
+        self.resolve(rows, 'category', Category, self.categories)
+        self.resolve(rows, 'brand', Brand, self.brands)
+
+        products = {}
+        images = {}
+        for line_number, row in rows:
+            try:
+                values = self.build(row)
+                urls = _list(row.get('images'), 'images')
+            except RowError as exc:
+                self.reject(line_number, exc)
+                continue
+            # Rows without a sku are always new; a repeated sku keeps the
+            # last row, images included
+            key = values['sku'] or ('line', line_number)
+            products[key] = Product(**values)
+            images.pop(key, None)
+            if row.get('images') not in (None, ''):
+                images[key] = urls
+
+        with transaction.atomic():
+            skus = [key for key in products if isinstance(key, str)]
+            existing = dict(Product.objects.filter(sku__in=skus).values_list('sku', 'id'))
+            new, changed = [], []
+            for key, product in products.items():
+                if key in existing:
+                    product.id = existing[key]
+                    changed.append(product)
+                else:
+                    new.append(product)
+
+            Product.objects.bulk_create(new, batch_size=self.batch_size)
+            if changed:
+                # bulk_update bypasses auto_now, so stamp updated_at here
+                updated_at = timezone.now()
+                for product in changed:
+                    product.updated_at = updated_at
+                Product.objects.bulk_update(changed, UPDATE_FIELDS, batch_size=self.batch_size)
+
+            if images:
+                replaced = [products[key].id for key in images]
+                ProductImage.objects.filter(product_id__in=replaced).delete()
+                ProductImage.objects.bulk_create([
+                    ProductImage(product_id=products[key].id, image_url=url, order=order)
+                    for key, urls in images.items()
+                    for order, url in enumerate(urls)
+                ], batch_size=self.batch_size)
+                bump_version('productimage')
+
+            saved = list(products.values())
+            search.index_products(
+                ((product.id, product.name, product.description, product.tags) for product in new),
+                replace=False,
+            )
+            search.index_products(
+                (product.id, product.name, product.description, product.tags)
+                for product in changed
+            )
+            tagging.sync_tags({product.id: product.tags for product in saved})
+            if saved:
+                bump_version('product')
+
+        self.created += len(new)
+        self.updated += len(changed)
+        total = self.created + self.updated
+        elapsed = time.monotonic() - self.started
+        self.stdout.write(
+            f'{total} products written ({total / max(elapsed, 1e-9):.0f} rows/sec)'
+        )
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from products import ratings
+
+
+class Command(BaseCommand):
+    help = 'Recompute product ratings, review counts and star histograms from reviews'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        total = ratings.rebuild_all(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt ratings for {total} reviewed products'))
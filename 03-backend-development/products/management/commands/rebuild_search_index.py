@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from products import search
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index used by /api/search/'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        using = options['database']
+        if not search.is_available(using) and not search.create_index(connections[using]):
+            raise CommandError('FTS5 is not available on this database')
+        total = search.rebuild_index(
+            Product.objects.using(using), using=using, batch_size=options['batch_size']
+        )
+        self.stdout.write(self.style.SUCCESS(f'Indexed {total} products'))
@@ -0,0 +1,369 @@
+"""
+In-process metrics in the Prometheus text format, served at /metrics.
+
+`MetricsMiddleware` records, per URL name (`product-search`,
+`product-detail`, ...): request counts by status, a latency histogram,
+and SQL query counts and time. The response and search count caches
+record hits and misses, exposed as counters and as a hit ratio gauge.
+
+Each worker process keeps its own registry. With several workers
+(gunicorn, uvicorn --workers) set PRODUCTS_METRICS_DIR (or the
+environment variable of the same name) to a directory shared by the
+workers: every process then writes a snapshot of its registry to its
+own file there, at most every PRODUCTS_METRICS_FLUSH_INTERVAL seconds
+from a background thread, and /metrics sums the files of all processes.
+Files of exited workers are kept, so counters never go backwards; clear
+the directory when the server restarts.
+
+/metrics only answers clients in PRODUCTS_METRICS_ALLOWED_IPS (addresses
+or networks, local only by default); an empty list disables it.
+"""
+import atexit
+import ipaddress
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.views.decorators.http import require_GET
+
+from . import instrumentation
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+UNMATCHED_VIEW = 'unmatched'
+# Any other method is counted as OTHER_METHOD, so clients cannot grow the
+# label set with arbitrary method names
+HTTP_METHODS = frozenset({'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS', 'CONNECT', 'TRACE'})
+OTHER_METHOD = 'other'
+
+
+class Metric:
+    """A counter or histogram with a fixed set of label names"""
+
+    def __init__(self, name, documentation, labelnames, kind='counter', buckets=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.kind = kind
+        self.buckets = tuple(buckets or ())
+
+
+class Registry:
+    """
+    Thread-safe metric values of this process.
+
+    Values are keyed by metric name and label values. A counter value is a
+    number; a histogram value is [per-bucket counts..., sum, count] with
+    non-cumulative bucket counts, so snapshots can be summed element-wise.
+    """
+
+    def __init__(self):
+        self.metrics = {}
+        self.values = {}
+        self.lock = threading.Lock()
+        self.pid = os.getpid()
+        self.dirty = False
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        self.values[metric.name] = {}
+        return metric
+
+    def _series(self, name, labels):
+        if self.pid != os.getpid():
+            # Forked after recording: the parent's values are not ours
+            self.pid = os.getpid()
+            for series in self.values.values():
+                series.clear()
+        return self.values[name], tuple(str(value) for value in labels)
+
+    def inc(self, name, labels, amount=1):
+        with self.lock:
+            series, key = self._series(name, labels)
+            series[key] = series.get(key, 0) + amount
+            self.dirty = True
+
+    def observe(self, name, labels, value):
+        buckets = self.metrics[name].buckets
+        with self.lock:
+            series, key = self._series(name, labels)
+            counts = series.get(key)
+            if counts is None:
+                counts = series[key] = [0] * (len(buckets) + 3)
+            index = next((i for i, bound in enumerate(buckets) if value <= bound), len(buckets))
+            counts[index] += 1
+            counts[-2] += value
+            counts[-1] += 1
+            self.dirty = True
+
+    def snapshot(self):
+        """JSON-serializable copy of the values"""
+        with self.lock:
+            self.dirty = False
+            return {
+                name: [[list(key), value if isinstance(value, (int, float)) else list(value)]
+                       for key, value in series.items()]
+                for name, series in self.values.items()
+            }
+
+
+def merge(snapshots):
+    """Sum snapshots from several processes into {name: {labels: value}}"""
+    merged = {}
+    for snapshot in snapshots:
+        for name, series in snapshot.items():
+            target = merged.setdefault(name, {})
+            for key, value in series:
+                key = tuple(key)
+                if isinstance(value, list):
+                    current = target.get(key)
+                    target[key] = value if current is None else [a + b for a, b in zip(current, value)]
+                else:
+                    target[key] = target.get(key, 0) + value
+    return merged
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"'))
+        for name, value in pairs
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def _number(value):
+    if isinstance(value, float):
+        if math.isinf(value):
+            return '+Inf' if value > 0 else '-Inf'
+        return repr(value)
+    return str(value)
+
+
+def render(metrics, values):
+    """Prometheus text exposition of merged values"""
+    lines = []
+    for metric in metrics.values():
+        series = values.get(metric.name, {})
+        lines.append(f'# HELP {metric.name} {metric.documentation}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        for key in sorted(series):
+            value = series[key]
+            if metric.kind == 'histogram':
+                cumulative = 0
+                for bound, count in zip(metric.buckets + (float('inf'),), value[:-2]):
+                    cumulative += count
+                    labels = _labels(metric.labelnames, key, [('le', _number(float(bound)))])
+                    lines.append(f'{metric.name}_bucket{labels} {cumulative}')
+                labels = _labels(metric.labelnames, key)
+                lines.append(f'{metric.name}_sum{labels} {_number(value[-2])}')
+                lines.append(f'{metric.name}_count{labels} {value[-1]}')
+            else:
+                lines.append(f'{metric.name}{_labels(metric.labelnames, key)} {_number(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+def render_hit_ratios(values):
+    """Derived gauge: hits / lookups per cache, over the process lifetime"""
+    totals = {}
+    for (cache, result), count in values.get(CACHE.name, {}).items():
+        hits, lookups = totals.get(cache, (0, 0))
+        totals[cache] = (hits + (count if result == 'hit' else 0), lookups + count)
+    lines = [
+        '# HELP cache_hit_ratio Cache hits / lookups since the workers started.',
+        '# TYPE cache_hit_ratio gauge',
+    ]
+    for cache, (hits, lookups) in sorted(totals.items()):
+        lines.append(f'cache_hit_ratio{_labels(["cache"], [cache])} {_number(hits / lookups)}')
+    return '\n'.join(lines) + '\n'
+
+
+class MultiProcessStore:
+    """Per-process snapshot files in a shared directory"""
+
+    def __init__(self, registry, directory, interval):
+        self.registry = registry
+        self.directory = directory
+        self.interval = interval
+        self.thread_pid = None
+
+    @property
+    def path(self):
+        return os.path.join(self.directory, f'metrics_{os.getpid()}.json')
+
+    def flush(self):
+        handle, temporary = tempfile.mkstemp(dir=self.directory, prefix='.metrics_')
+        with os.fdopen(handle, 'w') as stream:
+            json.dump(self.registry.snapshot(), stream)
+        # Readers never see a half-written file
+        os.replace(temporary, self.path)
+
+    def try_flush(self):
+        """Flush from the background thread or at exit, where errors have nowhere to go"""
+        try:
+            self.flush()
+        except OSError:
+            pass
+
+    def ensure_flusher(self):
+        """Start the flush thread once per process (threads do not survive fork)"""
+        if self.thread_pid == os.getpid():
+            return
+        self.thread_pid = os.getpid()
+        threading.Thread(target=self.run, daemon=True, name='metrics-flush').start()
+
+    def run(self):
+        # Stops once the settings point somewhere else
+        while _store is self:
+            time.sleep(self.interval)
+            if self.registry.dirty and _store is self:
+                self.try_flush()
+
+    def collect(self):
+        self.flush()
+        snapshots = []
+        for name in os.listdir(self.directory):
+            if not (name.startswith('metrics_') and name.endswith('.json')):
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as stream:
+                    snapshots.append(json.load(stream))
+            except (OSError, ValueError):
+                continue  # removed or replaced while listing
+        return merge(snapshots)
+
+
+REGISTRY = Registry()
+REQUESTS = REGISTRY.register(Metric(
+    'http_requests_total', 'HTTP requests by view, method and status.',
+    ['view', 'method', 'status'],
+))
+LATENCY = REGISTRY.register(Metric(
+    'http_request_duration_seconds', 'HTTP request latency by view and method.',
+    ['view', 'method'], kind='histogram', buckets=LATENCY_BUCKETS,
+))
+DB_QUERIES = REGISTRY.register(Metric(
+    'db_queries_total', 'SQL statements executed, by view.', ['view'],
+))
+DB_TIME = REGISTRY.register(Metric(
+    'db_query_duration_seconds_total', 'Time spent in SQL statements, by view.', ['view'],
+))
+CACHE = REGISTRY.register(Metric(
+    'cache_requests_total', 'Cache lookups by cache and result (hit or miss).', ['cache', 'result'],
+))
+
+_store = None
+
+
+def get_store():
+    """The multiprocess store, or None in single-process mode"""
+    global _store
+    directory = getattr(settings, 'PRODUCTS_METRICS_DIR', None)
+    if not directory:
+        _store = None
+        return None
+    if _store is None or _store.directory != directory:
+        os.makedirs(directory, exist_ok=True)
+        interval = getattr(settings, 'PRODUCTS_METRICS_FLUSH_INTERVAL', 1.0)
+        _store = MultiProcessStore(REGISTRY, directory, interval)
+        atexit.register(_store.try_flush)
+    return _store
+
+
+def record_cache(cache, hit):
+    REGISTRY.inc(CACHE.name, (cache, 'hit' if hit else 'miss'))
+
+
+def method_label(method):
+    return method if method in HTTP_METHODS else OTHER_METHOD
+
+
+class MetricsMiddleware:
+    """Record request, latency and SQL metrics per URL name"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = instrumentation.current_metrics()
+        if metrics is None:
+            # ServerTimingMiddleware is off: count the SQL ourselves
+            with instrumentation.collect() as metrics:
+                return self.record(request, metrics)
+        return self.record(request, metrics)
+
+    async def __acall__(self, request):
+        metrics = instrumentation.current_metrics()
+        if metrics is None:
+            async with instrumentation.acollect() as metrics:
+                return await self.arecord(request, metrics)
+        return await self.arecord(request, metrics)
+
+    def record(self, request, metrics):
+        started = time.perf_counter()
+        queries, sql_time = metrics.queries, metrics.sql_time
+        response = self.get_response(request)
+        self.observe(request, response, metrics, started, queries, sql_time)
+        return response
+
+    async def arecord(self, request, metrics):
+        started = time.perf_counter()
+        queries, sql_time = metrics.queries, metrics.sql_time
+        response = await self.get_response(request)
+        self.observe(request, response, metrics, started, queries, sql_time)
+        return response
+
+    def observe(self, request, response, metrics, started, queries, sql_time):
+        elapsed = time.perf_counter() - started
+        match = request.resolver_match
+        view = match.url_name if match is not None and match.url_name else UNMATCHED_VIEW
+        method = method_label(request.method)
+        REGISTRY.inc(REQUESTS.name, (view, method, response.status_code))
+        REGISTRY.observe(LATENCY.name, (view, method), elapsed)
+        REGISTRY.inc(DB_QUERIES.name, (view,), metrics.queries - queries)
+        REGISTRY.inc(DB_TIME.name, (view,), metrics.sql_time - sql_time)
+
+        store = get_store()
+        if store is not None:
+            store.ensure_flusher()
+
+
+def is_allowed(address):
+    """Whether `address` is in PRODUCTS_METRICS_ALLOWED_IPS"""
+    try:
+        address = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(
+        address in ipaddress.ip_network(network, strict=False)
+        for network in getattr(settings, 'PRODUCTS_METRICS_ALLOWED_IPS', ('127.0.0.1', '::1'))
+    )
+
+
+@require_GET
+def metrics_view(request):
+    """Prometheus scrape endpoint"""
+    if not is_allowed(request.META.get('REMOTE_ADDR', '')):
+        # Not advertised to clients outside the allowlist
+        raise Http404
+    store = get_store()
+    if store is not None:
+        values = store.collect()
+    else:
+        values = merge([REGISTRY.snapshot()])
+    body = render(REGISTRY.metrics, values) + render_hit_ratios(values)
+    return HttpResponse(body, content_type=CONTENT_TYPE)
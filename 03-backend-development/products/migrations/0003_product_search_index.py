@@ -0,0 +1,32 @@
+# Full-text search index for products (SQLite FTS5)
+
+from django.db import migrations
+
+from products import search
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if not search.create_index(connection):
+        # FTS5 unavailable: product_search falls back to icontains filtering
+        return
+    Product = apps.get_model('products', 'Product')
+    rows = Product.objects.using(connection.alias).values_list(
+        'id', 'name', 'description', 'tags'
+    )
+    search.index_products(rows, using=connection.alias, replace=False)
+
+
+def drop_search_index(apps, schema_editor):
+    search.drop_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0002_product_thumbnail_url_productimage_image_url_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 5.2.18 on 2026-10-17 10:03
+
+from django.db import migrations, models
+from django.db.models import Case, Count, DecimalField, F, FloatField, Q, Sum, Value, When
+from django.db.models.functions import Cast, Round
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    Review = apps.get_model('products', 'Review')
+    histogram = {
+        f'rating_{star}_count': Count('pk', filter=Q(rating=star)) for star in range(1, 6)
+    }
+    grouped = (
+        Review.objects.using(schema_editor.connection.alias)
+        .order_by()
+        .values('product_id')
+        .annotate(total=Sum('rating'), count=Count('pk'), **histogram)
+    )
+    for row in grouped:
+        product_id = row.pop('product_id')
+        Product.objects.using(schema_editor.connection.alias).filter(pk=product_id).update(
+            rating_sum=row.pop('total'),
+            review_count=row.pop('count'),
+            **row,
+        )
+    # The same rounding as products.ratings.apply_delta, in SQL
+    Product.objects.using(schema_editor.connection.alias).filter(review_count__gt=0).update(
+        rating=Case(
+            When(review_count__gt=0, then=Round(Cast('rating_sum', FloatField()) / F('review_count'), 2)),
+            default=Value(0),
+            output_field=DecimalField(max_digits=3, decimal_places=2),
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0004_product_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='rating_1_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_2_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_3_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_4_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_5_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_rating_aggregates, migrations.RunPython.noop),
+    ]
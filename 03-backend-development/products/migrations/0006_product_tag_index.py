@@ -0,0 +1,71 @@
+# Generated by Django 5.2.18 on 2026-10-17 10:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_tag_index(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    Tag = apps.get_model('products', 'Tag')
+    ProductTag = apps.get_model('products', 'ProductTag')
+    using = schema_editor.connection.alias
+
+    links = []
+    names = set()
+    for product_id, tags in Product.objects.using(using).values_list('id', 'tags').iterator():
+        if not isinstance(tags, list):
+            tags = [tags] if tags else []
+        product_names = {' '.join(str(tag).lower().split())[:100] for tag in tags} - {''}
+        names |= product_names
+        links.extend((product_id, name) for name in product_names)
+
+    Tag.objects.using(using).bulk_create(
+        [Tag(name=name) for name in names], batch_size=1000, ignore_conflicts=True
+    )
+    tag_ids = dict(Tag.objects.using(using).values_list('name', 'id'))
+    ProductTag.objects.using(using).bulk_create(
+        [ProductTag(product_id=product_id, tag_id=tag_ids[name]) for product_id, name in links],
+        batch_size=1000, ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_product_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tag_links', to='products.product')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='product_links', to='products.tag')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='tag_index',
+            field=models.ManyToManyField(blank=True, editable=False, related_name='products', through='products.ProductTag', to='products.tag'),
+        ),
+        migrations.AddIndex(
+            model_name='producttag',
+            index=models.Index(fields=['tag', 'product'], name='products_pr_tag_id_f1b064_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='producttag',
+            constraint=models.UniqueConstraint(fields=('product', 'tag'), name='unique_product_tag'),
+        ),
+        migrations.RunPython(backfill_tag_index, migrations.RunPython.noop),
+    ]
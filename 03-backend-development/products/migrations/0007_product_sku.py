@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 10:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0006_product_tag_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='sku',
+            field=models.CharField(blank=True, help_text='Stock keeping unit, used as the import key', max_length=64, null=True, unique=True),
+        ),
+    ]
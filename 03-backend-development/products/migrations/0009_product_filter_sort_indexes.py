@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-17 10:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0008_review_product_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='product',
+            name='products_pr_price_9b1a5f_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='product',
+            name='products_pr_rating_c3ba71_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='product',
+            name='products_pr_in_stoc_4fee1a_idx',
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['category', 'created_at', 'id'], name='products_pr_categor_67fdd1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['category', 'rating', 'created_at', 'id'], name='products_pr_categor_af251e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['category', 'price', 'id'], name='products_pr_categor_12fcd0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['brand', 'created_at', 'id'], name='products_pr_brand_i_44af2e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['brand', 'rating', 'created_at', 'id'], name='products_pr_brand_i_75748a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['brand', 'price', 'id'], name='products_pr_brand_i_84cdf9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['in_stock', 'rating', 'created_at', 'id'], name='products_pr_in_stoc_051e99_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Search index keyed by rowid: rebuild it with the products_product_fts_key table
+
+from django.db import migrations
+
+from products import search
+
+
+def rebuild_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    search.drop_index(connection)
+    if not search.create_index(connection):
+        return
+    Product = apps.get_model('products', 'Product')
+    search.rebuild_index(Product.objects.using(connection.alias), using=connection.alias)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0010_image_variants'),
+    ]
+
+    operations = [
+        # The previous layout is rebuilt by migrating forward again
+        migrations.RunPython(rebuild_search_index, migrations.RunPython.noop),
+    ]
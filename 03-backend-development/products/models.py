@@ -8,6 +8,8 @@ class Category(models.Model):
     name = models.CharField(max_length=100, unique=True)
     description = models.TextField(blank=True)
     image = models.ImageField(upload_to='categories/', blank=True, null=True)
+    # Resized copies written by products.images after upload
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -25,6 +27,8 @@ class Brand(models.Model):
     name = models.CharField(max_length=100, unique=True)
     description = models.TextField(blank=True)
     logo = models.ImageField(upload_to='brands/', blank=True, null=True)
+    # Resized copies written by products.images after upload
+    logo_variants = models.JSONField(default=dict, blank=True, editable=False)
     website = models.URLField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -36,10 +40,23 @@ class Brand(models.Model):
         return self.name
 
 
+def calculate_is_on_sale(price, original_price):
+    """Check if a price/original price pair is on sale"""
+    return original_price and original_price > price
+
+
+def calculate_discount_percentage(price, original_price):
+    """Calculate discount percentage for a price/original price pair"""
+    if calculate_is_on_sale(price, original_price):
+        return round(((original_price - price) / original_price) * 100, 2)
+    return 0
+
+
 class Product(models.Model):
     """Main product model matching frontend TypeScript interface"""
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     name = models.CharField(max_length=200)
+    sku = models.CharField(max_length=64, unique=True, blank=True, null=True, help_text="Stock keeping unit, used as the import key")
     description = models.TextField()
     price = models.DecimalField(max_digits=10, decimal_places=2)
     original_price = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
@@ -59,13 +76,26 @@ class Product(models.Model):
         validators=[MinValueValidator(0.00), MaxValueValidator(5.00)]
     )
     review_count = models.PositiveIntegerField(default=0)
+    # Running aggregates kept up to date by products.ratings on review writes
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_1_count = models.PositiveIntegerField(default=0)
+    rating_2_count = models.PositiveIntegerField(default=0)
+    rating_3_count = models.PositiveIntegerField(default=0)
+    rating_4_count = models.PositiveIntegerField(default=0)
+    rating_5_count = models.PositiveIntegerField(default=0)
     
     # SEO and tags
     tags = models.JSONField(default=list, blank=True)
+    # Normalized copy of `tags` for indexed filtering, synced on save
+    tag_index = models.ManyToManyField(
+        'Tag', through='ProductTag', related_name='products', blank=True, editable=False
+    )
     specifications = models.JSONField(default=dict, blank=True)
     
     # Images
     thumbnail = models.ImageField(upload_to='products/thumbnails/', blank=True, null=True)
+    # Resized copies written by products.images after upload
+    thumbnail_variants = models.JSONField(default=dict, blank=True, editable=False)
     thumbnail_url = models.URLField(blank=True, null=True, help_text="External thumbnail URL")
     
     # Timestamps
@@ -76,9 +106,23 @@ class Product(models.Model):
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['category', 'brand']),
-            models.Index(fields=['price']),
-            models.Index(fields=['rating']),
-            models.Index(fields=['in_stock']),
+            # Keyset pagination: every sort key paired with the id tie-breaker
+            models.Index(fields=['created_at', 'id']),
+            models.Index(fields=['price', 'id']),
+            models.Index(fields=['rating', 'id']),
+            models.Index(fields=['name', 'id']),
+            models.Index(fields=['rating', 'created_at', 'id']),
+            # Filter + sort shapes of the product list (newest, price) and of
+            # search (-rating, -created_at): equality column first, then the
+            # sort keys, so filtered pages are read in order without a sort
+            # step (checked by QueryPlanTests)
+            models.Index(fields=['category', 'created_at', 'id']),
+            models.Index(fields=['category', 'rating', 'created_at', 'id']),
+            models.Index(fields=['category', 'price', 'id']),
+            models.Index(fields=['brand', 'created_at', 'id']),
+            models.Index(fields=['brand', 'rating', 'created_at', 'id']),
+            models.Index(fields=['brand', 'price', 'id']),
+            models.Index(fields=['in_stock', 'rating', 'created_at', 'id']),
         ]
 
     def __str__(self):
@@ -87,14 +131,42 @@ class Product(models.Model):
     @property
     def is_on_sale(self):
         """Check if product is on sale"""
-        return self.original_price and self.original_price > self.price
+        return calculate_is_on_sale(self.price, self.original_price)
 
     @property
     def discount_percentage(self):
         """Calculate discount percentage"""
-        if self.is_on_sale:
-            return round(((self.original_price - self.price) / self.original_price) * 100, 2)
-        return 0
+        return calculate_discount_percentage(self.price, self.original_price)
+
+
+class Tag(models.Model):
+    """Normalized (lowercase, trimmed) product tag"""
+    name = models.CharField(max_length=100, unique=True)
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+
+class ProductTag(models.Model):
+    """Link between a product and one of its tags"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='tag_links')
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name='product_links')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'tag'], name='unique_product_tag'),
+        ]
+        indexes = [
+            # Tag -> products lookups (filtering); the unique constraint
+            # already covers product -> tags
+            models.Index(fields=['tag', 'product']),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} - {self.tag_id}"
 
 
 class ProductImage(models.Model):
@@ -102,6 +174,8 @@ class ProductImage(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='images')
     image = models.ImageField(upload_to='products/images/', blank=True, null=True)
+    # Resized copies written by products.images after upload
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     image_url = models.URLField(blank=True, null=True, help_text="External image URL")
     alt_text = models.CharField(max_length=200, blank=True)
     order = models.PositiveIntegerField(default=0)
@@ -132,6 +206,12 @@ class Review(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Newest / most helpful reviews of a product; the trailing id is
+            # the keyset pagination tie-breaker
+            models.Index(fields=['product', '-created_at', '-id']),
+            models.Index(fields=['product', '-helpful_count', '-created_at', '-id']),
+        ]
 
     def __str__(self):
         return f"Review for {self.product.name} by {self.user_name}"
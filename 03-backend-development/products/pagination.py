@@ -0,0 +1,225 @@
+"""
+Pagination for product endpoints.
+
+Besides classic page numbers, product listing and search support an
+opt-in keyset ("cursor") mode: `?pagination=cursor` starts at the first
+page and every response carries opaque cursors for the next/previous
+page. Instead of `OFFSET n`, each page is fetched with a
+`WHERE (sort_key, id) > (last_sort_key, last_id)` condition, so page
+1000 costs the same as page 1 as long as an index on `(sort_key, id)`
+exists (see `Product.Meta.indexes`).
+"""
+import base64
+import binascii
+import datetime
+import decimal
+import json
+import uuid
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+CURSOR_PARAM = 'cursor'
+INVALID_CURSOR = 'Invalid cursor'
+
+
+def wants_cursor(query_params):
+    """Return True when the client opted into keyset pagination"""
+    return CURSOR_PARAM in query_params or query_params.get('pagination') == 'cursor'
+
+
+def parse_page_params(query_params, default_page_size=20):
+    """
+    `page` and `page_size` of a page-number request as positive integers;
+    raises ValueError for anything else
+    """
+    values = []
+    for name, default in (('page', 1), ('page_size', default_page_size)):
+        raw = query_params.get(name, '').strip()
+        try:
+            value = int(raw) if raw else default
+        except ValueError:
+            value = 0
+        if value < 1:
+            raise ValueError(f'{name} must be a positive integer')
+        values.append(value)
+    return tuple(values)
+
+
+def get_ordering(queryset):
+    """
+    Return the active ordering of `queryset` as a list of (field, descending)
+    pairs, always ending with `id` as a unique tie-breaker.
+
+    The tie-breaker follows the direction of the last sort key so that a
+    single `(sort_key, id)` index can serve the query in either direction.
+    """
+    ordering = list(queryset.query.order_by) or list(queryset.model._meta.ordering)
+    fields = []
+    for item in ordering:
+        if not isinstance(item, str):
+            raise ValueError('Keyset pagination requires field-name ordering')
+        name = item.lstrip('-')
+        if name in ('id', 'pk'):
+            continue
+        fields.append((name, item.startswith('-')))
+    descending = fields[-1][1] if fields else False
+    fields.append(('id', descending))
+    return fields
+
+
+class IndexOrderingFilter(OrderingFilter):
+    """
+    OrderingFilter that completes the requested ordering with the view's
+    `ordering_tie_breakers` ({field: (fields, ...)}), in the direction of
+    the last sort key, so that it (and the keyset built from it) follows
+    the column order of a composite index.
+    """
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if not ordering:
+            return ordering
+        ordering = list(ordering)
+        last = ordering[-1]
+        prefix = '-' if last.startswith('-') else ''
+        present = {item.lstrip('-') for item in ordering}
+        for name in getattr(view, 'ordering_tie_breakers', {}).get(last.lstrip('-'), ()):
+            if name not in present:
+                ordering.append(prefix + name)
+        return ordering
+
+
+def _dump(value):
+    """Make a sort key value JSON safe without losing precision"""
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, (decimal.Decimal, uuid.UUID)):
+        return str(value)
+    return value
+
+
+def encode_cursor(values, reverse=False):
+    payload = {'v': [_dump(value) for value in values]}
+    if reverse:
+        payload['r'] = 1
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token, model, fields):
+    """Decode a cursor into typed sort key values and a direction flag"""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        payload = json.loads(raw)
+        values = payload['v']
+        if len(values) != len(fields):
+            raise ValueError
+        values = [
+            model._meta.get_field(name).to_python(value)
+            for (name, _), value in zip(fields, values)
+        ]
+    except (binascii.Error, ValueError, TypeError, KeyError, ValidationError):
+        raise NotFound(INVALID_CURSOR)
+    return values, bool(payload.get('r'))
+
+
+def _row_value(row, name):
+    return row[name] if isinstance(row, dict) else getattr(row, name)
+
+
+def _keyset_filter(fields, values, reverse):
+    """
+    Build the row-value comparison `(a, b, id) > (va, vb, vid)` as an OR of
+    ANDs, honouring each field's direction.
+    """
+    condition = Q()
+    for position, (name, descending) in enumerate(fields):
+        lookup = 'lt' if descending != reverse else 'gt'
+        clause = Q(**{f'{name}__{lookup}': values[position]})
+        for prior, (prior_name, _) in enumerate(fields[:position]):
+            clause &= Q(**{prior_name: values[prior]})
+        condition |= clause
+    return condition
+
+
+class KeysetPage:
+    """One page of keyset-paginated results"""
+
+    def __init__(self, results, next_cursor, previous_cursor):
+        self.results = results
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+
+def paginate_keyset(queryset, cursor, page_size):
+    """
+    Fetch one page of `queryset` after (or before) `cursor`.
+
+    Only `page_size + 1` rows are read, whatever the depth of the page.
+    """
+    fields = get_ordering(queryset)
+    reverse = False
+    if cursor:
+        values, reverse = decode_cursor(cursor, queryset.model, fields)
+        queryset = queryset.filter(_keyset_filter(fields, values, reverse))
+
+    queryset = queryset.order_by(*[
+        ('-' if descending != reverse else '') + name
+        for name, descending in fields
+    ])
+    rows = list(queryset[:page_size + 1])
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if reverse:
+        rows.reverse()
+
+    def cursor_for(row, backwards=False):
+        return encode_cursor([_row_value(row, name) for name, _ in fields], backwards)
+
+    next_cursor = previous_cursor = None
+    if rows:
+        if has_more or reverse:
+            next_cursor = cursor_for(rows[-1])
+        if (has_more and reverse) or (cursor and not reverse):
+            previous_cursor = cursor_for(rows[0], backwards=True)
+    return KeysetPage(rows, next_cursor, previous_cursor)
+
+
+class ProductPagination(PageNumberPagination):
+    """Page number pagination with an opt-in keyset mode"""
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset_page = None
+        if not wants_cursor(request.query_params):
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.keyset_page = paginate_keyset(
+            queryset,
+            request.query_params.get(CURSOR_PARAM),
+            self.get_page_size(request),
+        )
+        return self.keyset_page.results
+
+    def get_cursor_link(self, cursor):
+        if cursor is None:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), 'pagination')
+        return replace_query_param(url, CURSOR_PARAM, cursor)
+
+    def get_paginated_response(self, data):
+        if self.keyset_page is None:
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self.get_cursor_link(self.keyset_page.next_cursor),
+            'previous': self.get_cursor_link(self.keyset_page.previous_cursor),
+            'results': data,
+        })
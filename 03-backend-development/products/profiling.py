@@ -0,0 +1,180 @@
+"""
+On-demand request profiling.
+
+`ProfilingMiddleware` runs cProfile around the rest of the request (view,
+serialization and rendering) and records every SQL statement with its
+offset, duration and parameters. A request is profiled when:
+
+- it carries an `X-Profile: <token>` header matching
+  PRODUCTS_PROFILING_TOKEN (no token configured disables this), or
+- it is picked by random sampling, PRODUCTS_PROFILING_SAMPLE_RATE being
+  the fraction of requests to profile (0 disables sampling)
+
+Each profile is written to PRODUCTS_PROFILING_DIR as `<id>.prof` (load it
+with `python -m pstats` or snakeviz) and `<id>.json` (request, timings
+and SQL timeline). Explicitly requested profiles return their id in the
+`X-Profile-Id` response header. One request is profiled at a time per
+process; requests arriving meanwhile run normally.
+
+The token is only accepted in the header, never in the URL, where it
+would end up in access logs, browser history and Referer headers. A
+profiled request may be served from the response cache.
+
+Under ASGI, cProfile covers the event loop thread, including other
+requests' coroutines that run while this one awaits; ORM calls run in
+worker threads show up as time spent awaiting them, while the SQL
+timeline still records each statement.
+"""
+import cProfile
+import hmac
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .instrumentation import aexecute_wrappers, execute_wrappers
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+MAX_SQL_LENGTH = 2000
+MAX_PARAMS_LENGTH = 500
+
+# cProfile cannot run twice at once on Python 3.12+
+_profiler_lock = threading.Lock()
+
+
+def is_authorized(request):
+    """True when the request carries the configured profiling token"""
+    token = getattr(settings, 'PRODUCTS_PROFILING_TOKEN', None)
+    if not token:
+        return False
+    supplied = request.META.get(PROFILE_HEADER)
+    return bool(supplied) and hmac.compare_digest(supplied.encode(), token.encode())
+
+
+def is_sampled():
+    rate = getattr(settings, 'PRODUCTS_PROFILING_SAMPLE_RATE', 0)
+    return rate > 0 and random.random() < rate
+
+
+class SQLTimeline:
+    """Execute wrapper recording each statement relative to the request start"""
+
+    def __init__(self, started):
+        self.started = started
+        self.statements = []
+
+    def __call__(self, execute, sql, params, many, context):
+        alias = context['connection'].alias
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.statements.append({
+                'alias': alias,
+                'offset_ms': round((started - self.started) * 1000, 3),
+                'duration_ms': round((time.perf_counter() - started) * 1000, 3),
+                'many': many,
+                'sql': sql[:MAX_SQL_LENGTH],
+                'params': repr(params)[:MAX_PARAMS_LENGTH],
+            })
+
+
+def profile_id(request):
+    stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S')
+    return f'{stamp}-{request.method.lower()}-{uuid.uuid4().hex[:8]}'
+
+
+class ProfileRun:
+    """SQL timeline and response of one profiled request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.timeline = SQLTimeline(self.started)
+        self.response = None
+
+
+class ProfilingMiddleware:
+    """Profile requests on demand or by sampling; see the module docstring"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        explicit = is_authorized(request)
+        if not (explicit or is_sampled()):
+            return self.get_response(request)
+        if not _profiler_lock.acquire(blocking=False):
+            return self.get_response(request)
+        try:
+            run = ProfileRun()
+            with execute_wrappers(run.timeline), self.profiling(request, explicit, run):
+                run.response = self.get_response(request)
+            return run.response
+        finally:
+            _profiler_lock.release()
+
+    async def __acall__(self, request):
+        explicit = is_authorized(request)
+        if not (explicit or is_sampled()):
+            return await self.get_response(request)
+        if not _profiler_lock.acquire(blocking=False):
+            return await self.get_response(request)
+        try:
+            run = ProfileRun()
+            async with aexecute_wrappers(run.timeline):
+                with self.profiling(request, explicit, run):
+                    run.response = await self.get_response(request)
+            return run.response
+        finally:
+            _profiler_lock.release()
+
+    @contextmanager
+    def profiling(self, request, explicit, run):
+        """
+        Profile the block, which stores its response in `run`, then write
+        the profile and tag the response
+        """
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+        elapsed = time.perf_counter() - run.started
+        response, timeline = run.response, run.timeline
+
+        name = profile_id(request)
+        directory = getattr(settings, 'PRODUCTS_PROFILING_DIR', 'profiles')
+        os.makedirs(directory, exist_ok=True)
+        profiler.dump_stats(os.path.join(directory, f'{name}.prof'))
+        match = request.resolver_match
+        with open(os.path.join(directory, f'{name}.json'), 'w') as stream:
+            json.dump({
+                'id': name,
+                'trigger': 'request' if explicit else 'sample',
+                'method': request.method,
+                'path': request.path,
+                'query': dict(request.GET.items()),
+                'view': match.url_name if match is not None else None,
+                'status': response.status_code,
+                'total_ms': round(elapsed * 1000, 3),
+                'sql_ms': round(sum(item['duration_ms'] for item in timeline.statements), 3),
+                'sql_count': len(timeline.statements),
+                'sql': timeline.statements,
+            }, stream, indent=2)
+
+        if explicit:
+            response['X-Profile-Id'] = name
@@ -0,0 +1,75 @@
+"""
+Faster renderers for API responses.
+
+`ORJSONRenderer` is a drop-in replacement for DRF's `JSONRenderer` that
+serializes with orjson (UUID, datetime and dict/list subclasses are
+handled natively in C; Decimal and lazy strings go through DRF's
+encoder). For what the API returns - strings, integers, decimals,
+dates, datetimes with their microseconds, UUIDs - the bytes are the same
+as DRF's. They differ for floats printed with an exponent (orjson
+writes `1e16` and `1e-7`, DRF `1e+16` and `1e-07`) and for NaN and
+infinity, which orjson renders as `null` where DRF refuses them. Integers beyond 64 bits, which orjson cannot
+encode, are rendered by DRF. `MessagePackRenderer` offers a compact
+binary format selected with `Accept: application/msgpack`.
+
+Both libraries are optional: without orjson the JSON renderer falls back
+to the stdlib implementation, and the MessagePack renderer is only
+enabled in settings when msgpack is installed.
+"""
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+# Fallback for types without native support (Decimal -> float, lazy
+# translation strings, QuerySets, ...), shared with DRF's JSONEncoder
+_encode_default = encoders.JSONEncoder().default
+
+
+class ORJSONRenderer(JSONRenderer):
+    """JSON renderer backed by orjson, falling back to DRF's for pretty printing"""
+
+    if orjson is not None:
+        options = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or not self.compact or not self.strict or self.ensure_ascii:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            # orjson only supports 2-space indentation; let DRF pretty print
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=_encode_default, option=self.options)
+        except orjson.JSONEncodeError:
+            # e.g. integers beyond 64 bits; DRF's encoder handles or reports them
+            return super().render(data, accepted_media_type, renderer_context)
+        # Same as DRF: keep the output a strict JavaScript subset
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+class MessagePackRenderer(BaseRenderer):
+    """Binary MessagePack renderer (Accept: application/msgpack)"""
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if msgpack is None:
+            raise RuntimeError('MessagePackRenderer requires the msgpack package')
+        return msgpack.packb(data, default=_encode_default, use_bin_type=True)
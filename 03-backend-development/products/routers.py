@@ -0,0 +1,37 @@
+"""
+Read/write routing for the catalog.
+
+Reads of products app models go to the read-only 'replica' alias (a
+second connection to the same SQLite file), so long catalog queries run
+on their own connection and never sit in front of a writer; all writes
+go to 'default'. While 'default' is inside a transaction, reads stay on
+it so a transaction always sees its own uncommitted writes.
+"""
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+READ_ALIAS = 'replica'
+
+
+class CatalogRouter:
+    app_label = 'products'
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label != self.app_label or READ_ALIAS not in settings.DATABASES:
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return READ_ALIAS
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label != self.app_label:
+            return None
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases point at the same database
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        # The replica is the same file; migrate it through 'default' only
+        return db == DEFAULT_DB_ALIAS
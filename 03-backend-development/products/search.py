@@ -0,0 +1,199 @@
+"""
+Full-text search index for products.
+
+Products are mirrored into an SQLite FTS5 virtual table so that
+`product_search` can use an inverted index instead of scanning every row
+with LIKE '%query%'. The index is kept in sync by the signal handlers in
+`products.signals`; `manage.py rebuild_search_index` repopulates it.
+When FTS5 is not available (non-SQLite database, or SQLite compiled
+without FTS5) every helper degrades gracefully and callers fall back to
+the original `icontains` filtering.
+
+FTS5 can only look rows up by their integer rowid, and product ids are
+UUIDs: `products_product_fts_key` gives every indexed product a rowid
+(`id`) next to its `product_id`, so replacing or removing one product's
+row is an index lookup rather than a scan of the whole FTS table.
+"""
+import re
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models.expressions import RawSQL
+from django.db.utils import DatabaseError
+
+FTS_TABLE = 'products_product_fts'
+KEY_TABLE = 'products_product_fts_key'
+
+# Words are split on anything that is not a letter/digit, the same way the
+# unicode61 tokenizer does, so query tokens line up with indexed tokens.
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# Cached availability per database alias
+_available = {}
+
+
+def fts_supported(connection):
+    """Check whether the database engine can create FTS5 tables"""
+    if connection.vendor != 'sqlite':
+        return False
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+            if cursor.fetchone()[0]:
+                return True
+            # Some builds ship FTS5 as a loadable default without the flag
+            cursor.execute('CREATE VIRTUAL TABLE temp._fts5_probe USING fts5(x)')
+            cursor.execute('DROP TABLE temp._fts5_probe')
+            return True
+    except DatabaseError:
+        return False
+
+
+def create_index(connection):
+    """Create the FTS5 table; returns False when FTS5 is unsupported"""
+    if not fts_supported(connection):
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5('
+            'name, description, tags, '
+            "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+        )
+        cursor.execute(
+            f'CREATE TABLE IF NOT EXISTS {KEY_TABLE} ('
+            'id INTEGER PRIMARY KEY, product_id CHAR(32) NOT NULL UNIQUE)'
+        )
+    _available.pop(connection.alias, None)
+    return True
+
+
+def drop_index(connection):
+    """Drop the FTS5 table if it exists"""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+        cursor.execute(f'DROP TABLE IF EXISTS {KEY_TABLE}')
+    _available.pop(connection.alias, None)
+
+
+def is_available(using=DEFAULT_DB_ALIAS):
+    """Return True when the search index exists on the given database"""
+    if using not in _available:
+        connection = connections[using]
+        _available[using] = (
+            connection.vendor == 'sqlite'
+            and {FTS_TABLE, KEY_TABLE}.issubset(connection.introspection.table_names())
+        )
+    return _available[using]
+
+
+def _tags_text(tags):
+    """Flatten the JSON tags list into indexable text"""
+    if isinstance(tags, (list, tuple)):
+        return ' '.join(str(tag) for tag in tags)
+    return str(tags or '')
+
+
+def _row(product_id, name, description, tags):
+    return (name, description, _tags_text(tags), product_id.hex)
+
+
+# Index row of a product, looked up by rowid through the key table
+_DELETE_ROW_SQL = f'DELETE FROM {FTS_TABLE} WHERE rowid = (SELECT id FROM {KEY_TABLE} WHERE product_id = %s)'
+
+
+def index_products(rows, using=DEFAULT_DB_ALIAS, replace=True):
+    """
+    Insert or replace index rows.
+
+    `rows` is an iterable of (id, name, description, tags) tuples, which
+    lets migrations and bulk commands feed `values_list()` output directly.
+    Pass `replace=False` for products known to be new to skip the delete
+    of their previous row.
+    """
+    if not is_available(using):
+        return
+    rows = [_row(*row) for row in rows]
+    if not rows:
+        return
+    with connections[using].cursor() as cursor:
+        keys = [(row[3],) for row in rows]
+        if replace:
+            cursor.executemany(_DELETE_ROW_SQL, keys)
+        cursor.executemany(f'INSERT OR IGNORE INTO {KEY_TABLE} (product_id) VALUES (%s)', keys)
+        cursor.executemany(
+            f'INSERT INTO {FTS_TABLE} (rowid, name, description, tags) '
+            f'SELECT id, %s, %s, %s FROM {KEY_TABLE} WHERE product_id = %s',
+            rows,
+        )
+
+
+def index_product(product, using=DEFAULT_DB_ALIAS):
+    """Insert or refresh a single product in the index"""
+    index_products(
+        [(product.pk, product.name, product.description, product.tags)],
+        using=using,
+    )
+
+
+def remove_product(product_id, using=DEFAULT_DB_ALIAS):
+    """Remove a product from the index"""
+    if not is_available(using):
+        return
+    with connections[using].cursor() as cursor:
+        cursor.execute(_DELETE_ROW_SQL, [product_id.hex])
+        cursor.execute(f'DELETE FROM {KEY_TABLE} WHERE product_id = %s', [product_id.hex])
+
+
+def rebuild_index(queryset, using=DEFAULT_DB_ALIAS, batch_size=2000):
+    """Empty the index and repopulate it from `queryset`; returns row count"""
+    if not is_available(using):
+        return 0
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(f'DELETE FROM {KEY_TABLE}')
+    total = 0
+    batch = []
+    rows = queryset.values_list('id', 'name', 'description', 'tags')
+    for row in rows.iterator(chunk_size=batch_size):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            index_products(batch, using=using, replace=False)
+            total += len(batch)
+            batch = []
+    index_products(batch, using=using, replace=False)
+    return total + len(batch)
+
+
+def build_match_expression(query):
+    """
+    Turn free text into a safe FTS5 MATCH expression.
+
+    Every word becomes a quoted prefix term ("iph"*), so user input can
+    never inject FTS syntax, and partially typed words still match as the
+    user types. Returns None when the query has no searchable words.
+    """
+    tokens = TOKEN_RE.findall(query.lower())
+    if not tokens:
+        return None
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def filter_queryset(queryset, query):
+    """
+    Restrict `queryset` to products matching `query` via the FTS index.
+
+    Returns None when the index cannot serve the query so the caller can
+    fall back to `icontains` filtering.
+    """
+    using = queryset.db
+    expression = build_match_expression(query)
+    if expression is None or not is_available(using):
+        return None
+    # Sub-select keeps everything in a single SQL statement, regardless of
+    # how many products match.
+    return queryset.filter(id__in=RawSQL(
+        f'SELECT product_id FROM {KEY_TABLE} WHERE id IN '
+        f'(SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s)',
+        [expression],
+    ))
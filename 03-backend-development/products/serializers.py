@@ -1,32 +1,68 @@
-from rest_framework import serializers
-from .models import Category, Brand, Product, ProductImage, Review
+import decimal
+from operator import itemgetter
 
+from django.conf import settings
+from django.db.models import Prefetch
+from django.db.models.fields.files import FieldFile
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+from . import fieldsets, images
+from .instrumentation import TimedRepresentationMixin, timed
+from .models import (
+    Category, Brand, Product, ProductImage, Review,
+    calculate_discount_percentage, calculate_is_on_sale,
+)
+from .ratings import HISTOGRAM_FIELDS
 
-class CategorySerializer(serializers.ModelSerializer):
+
+class SrcsetField(serializers.Field):
+    """
+    Resized variants of an image field as {MIME type: srcset string}, null
+    until they are generated (see products.images)
+    """
+
+    def __init__(self, image_field, **kwargs):
+        self.image_field = image_field
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, instance):
+        return images.srcset(
+            getattr(instance, self.image_field).name,
+            getattr(instance, images.variants_field(self.image_field)),
+            self.context.get('request'),
+        )
+
+
+class CategorySerializer(TimedRepresentationMixin, serializers.ModelSerializer):
     """Serializer for Category model"""
+    image_srcset = SrcsetField('image')
     
     class Meta:
         model = Category
-        fields = '__all__'
+        exclude = ['image_variants']
 
 
-class BrandSerializer(serializers.ModelSerializer):
+class BrandSerializer(TimedRepresentationMixin, serializers.ModelSerializer):
     """Serializer for Brand model"""
+    logo_srcset = SrcsetField('logo')
     
     class Meta:
         model = Brand
-        fields = '__all__'
+        exclude = ['logo_variants']
 
 
-class ProductImageSerializer(serializers.ModelSerializer):
+class ProductImageSerializer(TimedRepresentationMixin, serializers.ModelSerializer):
     """Serializer for ProductImage model"""
+    image_srcset = SrcsetField('image')
     
     class Meta:
         model = ProductImage
-        fields = ['id', 'image', 'image_url', 'alt_text', 'order']
+        fields = ['id', 'image', 'image_srcset', 'image_url', 'alt_text', 'order']
 
 
-class ReviewSerializer(serializers.ModelSerializer):
+class ReviewSerializer(TimedRepresentationMixin, serializers.ModelSerializer):
     """Serializer for Review model"""
     
     class Meta:
@@ -35,48 +71,225 @@ class ReviewSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at', 'updated_at']
 
 
-class ProductListSerializer(serializers.ModelSerializer):
+class ProductListSerializer(fieldsets.SparseFieldsMixin, TimedRepresentationMixin, serializers.ModelSerializer):
     """Lightweight serializer for product list views"""
     category = serializers.StringRelatedField()
     brand = serializers.StringRelatedField()
     is_on_sale = serializers.ReadOnlyField()
     discount_percentage = serializers.ReadOnlyField()
+    thumbnail_srcset = SrcsetField('thumbnail')
+    # Columns read by the fields that are not plain model columns
+    column_sources = {
+        'category': ('category__name',),
+        'brand': ('brand__name',),
+        'thumbnail_srcset': ('thumbnail', 'thumbnail_variants'),
+        'is_on_sale': ('price', 'original_price'),
+        'discount_percentage': ('price', 'original_price'),
+    }
     
     class Meta:
         model = Product
         fields = [
             'id', 'name', 'description', 'price', 'original_price',
             'category', 'brand', 'in_stock', 'stock_quantity',
-            'rating', 'review_count', 'thumbnail', 'thumbnail_url', 'tags',
+            'rating', 'review_count', 'thumbnail', 'thumbnail_srcset', 'thumbnail_url', 'tags',
             'is_on_sale', 'discount_percentage', 'created_at'
         ]
 
 
-class ProductDetailSerializer(serializers.ModelSerializer):
-    """Detailed serializer for single product views"""
+def _decimal_formatter(field):
+    """
+    Fast DecimalField.to_representation for values already at the field's
+    scale (as loaded from the database); anything else goes through DRF.
+    """
+    coerce = getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+    if not coerce or field.localize:
+        return field.to_representation
+    exponent = -field.decimal_places
+
+    def to_representation(value):
+        if type(value) is decimal.Decimal and value.as_tuple().exponent == exponent:
+            return '{:f}'.format(value)
+        return field.to_representation(value)
+    return to_representation
+
+
+def _datetime_formatter(field):
+    """Fast DateTimeField.to_representation with the timezone looked up once"""
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+    if output_format is None or output_format.lower() != ISO_8601 or timezone is None:
+        return field.to_representation
+
+    def to_representation(value):
+        value = value.astimezone(timezone).isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+    return to_representation
+
+
+class FastProductListSerializer:
+    """
+    Read-only, high-throughput stand-in for ProductListSerializer(many=True).
+
+    Works on `.values()` rows (see `get_rows`) instead of model instances:
+    no Product/Category/Brand objects are built and DRF's per-field
+    machinery is bypassed. Values that need formatting reuse the
+    ProductListSerializer field objects, and the derived fields use the
+    same helpers as the model properties, so the rendered JSON is
+    byte-identical to the regular serializer.
+    """
+    value_fields = (
+        'id', 'name', 'description', 'price', 'original_price',
+        'category__name', 'brand__name', 'in_stock', 'stock_quantity',
+        'rating', 'review_count', 'thumbnail', 'thumbnail_variants', 'thumbnail_url', 'tags',
+        'created_at',
+    )
+
+    model_serializer = ProductListSerializer
+
+    def __init__(self, instance=None, many=True, context=None, fields=None, **kwargs):
+        self.instance = instance
+        self.context = context or {}
+        self.fields = fields
+
+    @classmethod
+    def get_rows(cls, queryset, fields=None):
+        """
+        Turn a product queryset into the rows this serializer expects; with
+        `fields`, only the columns those fields read (see products.fieldsets)
+        """
+        if fields is None:
+            return queryset.values(*cls.value_fields)
+        return queryset.values(*fieldsets.query_columns(queryset, cls, fields))
+
+    def get_formatters(self):
+        """Output field name -> function of a row"""
+        fields = ProductListSerializer(context=self.context).fields
+        uuid_repr = fields['id'].to_representation
+        price_repr = _decimal_formatter(fields['price'])
+        original_price_repr = _decimal_formatter(fields['original_price'])
+        rating_repr = _decimal_formatter(fields['rating'])
+        thumbnail_repr = fields['thumbnail'].to_representation
+        created_repr = _datetime_formatter(fields['created_at'])
+        thumbnail_field = Product._meta.get_field('thumbnail')
+        request = self.context.get('request')
+
+        def original_price(row):
+            value = row['original_price']
+            return None if value is None else original_price_repr(value)
+
+        def thumbnail(row):
+            name = row['thumbnail']
+            return thumbnail_repr(FieldFile(None, thumbnail_field, name)) if name else None
+
+        return {
+            'id': lambda row: uuid_repr(row['id']),
+            'name': itemgetter('name'),
+            'description': itemgetter('description'),
+            'price': lambda row: price_repr(row['price']),
+            'original_price': original_price,
+            'category': itemgetter('category__name'),
+            'brand': itemgetter('brand__name'),
+            'in_stock': itemgetter('in_stock'),
+            'stock_quantity': itemgetter('stock_quantity'),
+            'rating': lambda row: rating_repr(row['rating']),
+            'review_count': itemgetter('review_count'),
+            'thumbnail': thumbnail,
+            'thumbnail_srcset': lambda row: images.srcset(row['thumbnail'], row['thumbnail_variants'], request),
+            'thumbnail_url': itemgetter('thumbnail_url'),
+            'tags': itemgetter('tags'),
+            'is_on_sale': lambda row: calculate_is_on_sale(row['price'], row['original_price']),
+            'discount_percentage': lambda row: calculate_discount_percentage(row['price'], row['original_price']),
+            'created_at': lambda row: created_repr(row['created_at']),
+        }
+
+    @property
+    def data(self):
+        with timed('serialize'):
+            formatters = self.get_formatters()
+            if self.fields is not None:
+                formatters = {name: formatters[name] for name in self.fields}
+            formatters = tuple(formatters.items())
+            return [{name: format(row) for name, format in formatters} for row in self.instance]
+
+
+# Served by the (product, -helpful_count, -created_at, -id) index on Review
+TOP_REVIEW_ORDERING = ('-helpful_count', '-created_at')
+
+
+def top_reviews_prefetch():
+    """
+    Prefetch of the most helpful reviews embedded in product detail,
+    limited to PRODUCTS_DETAIL_REVIEW_LIMIT per product.
+    """
+    limit = getattr(settings, 'PRODUCTS_DETAIL_REVIEW_LIMIT', 5)
+    return Prefetch(
+        'reviews',
+        queryset=Review.objects.order_by(*TOP_REVIEW_ORDERING)[:limit],
+        to_attr='top_reviews',
+    )
+
+
+class ProductDetailSerializer(fieldsets.SparseFieldsMixin, TimedRepresentationMixin, serializers.ModelSerializer):
+    """
+    Detailed serializer for single product views.
+
+    Only the top reviews are embedded (see `top_reviews_prefetch`); the
+    full list is paginated at /api/products/{id}/reviews/.
+    """
     category = CategorySerializer(read_only=True)
     brand = BrandSerializer(read_only=True)
     images = ProductImageSerializer(many=True, read_only=True)
-    reviews = ReviewSerializer(many=True, read_only=True)
+    reviews = serializers.SerializerMethodField()
+    rating_histogram = serializers.SerializerMethodField()
     is_on_sale = serializers.ReadOnlyField()
     discount_percentage = serializers.ReadOnlyField()
+    thumbnail_srcset = SrcsetField('thumbnail')
+    # Columns read by the fields that are not plain model columns; images
+    # and reviews are prefetched
+    column_sources = {
+        'images': (),
+        'reviews': (),
+        'rating_histogram': tuple(HISTOGRAM_FIELDS.values()),
+        'thumbnail_srcset': ('thumbnail', 'thumbnail_variants'),
+        'is_on_sale': ('price', 'original_price'),
+        'discount_percentage': ('price', 'original_price'),
+    }
     
     class Meta:
         model = Product
-        fields = '__all__'
+        # tag_index is the internal normalized copy of `tags`, the rating
+        # aggregates are exposed as rating_histogram and the variant names
+        # as thumbnail_srcset
+        exclude = ['tag_index', 'thumbnail_variants', 'rating_sum', *HISTOGRAM_FIELDS.values()]
+
+    def get_reviews(self, product):
+        reviews = getattr(product, 'top_reviews', None)
+        if reviews is None:
+            limit = getattr(settings, 'PRODUCTS_DETAIL_REVIEW_LIMIT', 5)
+            reviews = product.reviews.order_by(*TOP_REVIEW_ORDERING)[:limit]
+        return ReviewSerializer(reviews, many=True, context=self.context).data
+
+    def get_rating_histogram(self, product):
+        """Review count per star rating, from the maintained aggregates"""
+        return {str(star): getattr(product, field) for star, field in HISTOGRAM_FIELDS.items()}
 
 
-class ProductCreateUpdateSerializer(serializers.ModelSerializer):
+class ProductCreateUpdateSerializer(TimedRepresentationMixin, serializers.ModelSerializer):
     """Serializer for creating and updating products"""
     
     class Meta:
         model = Product
         fields = [
-            'name', 'description', 'price', 'original_price',
+            'name', 'sku', 'description', 'price', 'original_price',
             'category', 'subcategory', 'brand', 'in_stock',
             'stock_quantity', 'rating', 'review_count',
             'tags', 'specifications', 'thumbnail', 'thumbnail_url'
         ]
+        # Maintained from the reviews (see products.ratings)
+        read_only_fields = ['rating', 'review_count']
 
     def validate(self, data):
         """Custom validation"""
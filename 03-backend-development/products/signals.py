@@ -0,0 +1,95 @@
+"""
+Signal handlers that keep derived data in sync with the catalog models.
+Connected in `ProductsConfig.ready()`.
+"""
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import images, ratings, search, tagging
+from .caching import bump_version
+from .models import Category, Brand, Product, ProductImage, Review
+
+
+@receiver(post_save, sender=Product, dispatch_uid='products_search_index_save')
+def update_search_index(sender, instance, using, raw=False, **kwargs):
+    """Refresh the product's row in the full-text search index"""
+    search.index_product(instance, using=using)
+
+
+@receiver(post_save, sender=Product, dispatch_uid='products_tag_index_save')
+def update_tag_index(sender, instance, raw=False, **kwargs):
+    """Mirror the JSON tags list into the normalized Tag/ProductTag index"""
+    if raw:
+        return
+    tagging.sync_product_tags(instance)
+
+
+@receiver(post_delete, sender=Product, dispatch_uid='products_search_index_delete')
+def remove_from_search_index(sender, instance, using, **kwargs):
+    """Drop a deleted product from the full-text search index"""
+    search.remove_product(instance.pk, using=using)
+
+
+@receiver(pre_save, sender=Review, dispatch_uid='products_rating_pre_save')
+def remember_review_rating(sender, instance, raw=False, **kwargs):
+    """Keep the stored product/rating so post_save can apply a delta"""
+    instance._rating_before = None
+    if raw or instance._state.adding:
+        return
+    instance._rating_before = (
+        Review.objects.filter(pk=instance.pk).values_list('product_id', 'rating').first()
+    )
+
+
+@receiver(post_save, sender=Review, dispatch_uid='products_rating_save')
+def update_product_rating(sender, instance, created, raw=False, **kwargs):
+    """Fold a new or edited review into the product's running aggregates"""
+    if raw:
+        return
+    before = getattr(instance, '_rating_before', None)
+    if created or before is None:
+        ratings.review_added(instance.product_id, instance.rating)
+    else:
+        ratings.review_changed(*before, instance.product_id, instance.rating)
+
+
+@receiver(post_delete, sender=Review, dispatch_uid='products_rating_delete')
+def remove_product_rating(sender, instance, origin=None, **kwargs):
+    """Take a deleted review out of the product's running aggregates"""
+    # Review's only foreign key is product: a deletion that started
+    # anywhere else is a cascade from its product, which is going too
+    origin_model = getattr(origin, 'model', type(origin))
+    if origin is not None and not issubclass(origin_model, Review):
+        return
+    ratings.review_removed(instance.product_id, instance.rating)
+
+
+def schedule_image_variants(sender, instance, using, raw=False, **kwargs):
+    """Generate resized variants once a new image upload is committed"""
+    if raw:
+        return
+    images.schedule(instance, using=using)
+
+
+for model in images.IMAGE_FIELDS:
+    post_save.connect(
+        schedule_image_variants, sender=model,
+        dispatch_uid=f'products_image_variants_{model._meta.model_name}',
+    )
+
+
+def bump_model_version(sender, **kwargs):
+    """Invalidate cached data (responses, search counts) built from `sender`"""
+    bump_version(sender._meta.model_name)
+
+
+# Every catalog model that ends up in a cached API response
+for model in (Category, Brand, Product, ProductImage, Review):
+    post_save.connect(
+        bump_model_version, sender=model,
+        dispatch_uid=f'products_version_save_{model._meta.model_name}',
+    )
+    post_delete.connect(
+        bump_model_version, sender=model,
+        dispatch_uid=f'products_version_delete_{model._meta.model_name}',
+    )
@@ -0,0 +1,221 @@
+"""
+Deterministic synthetic catalog data for benchmarks.
+
+Everything is derived from a seed: the products of chunk `n` only depend
+on `(seed, n)`, so a dataset is reproducible whatever the number of
+worker processes generating it. Distributions are skewed on purpose,
+because uniform data hides the query problems real catalogs have:
+
+- category and brand popularity follow a Zipf law (a few huge ones, a
+  long tail of small ones)
+- review counts per product are heavy-tailed (log-normal): most products
+  have a handful of reviews, bestsellers have thousands
+- ratings are J-shaped (mostly 4-5 stars) and shifted per product
+- tags and specification values come from per-category vocabularies
+
+Used by `manage.py generate_catalog`.
+"""
+import datetime
+import math
+import random
+import uuid
+from decimal import ROUND_HALF_UP, Decimal
+
+# Catalog epoch; fixed so generated timestamps are reproducible
+END_DATE = datetime.datetime(2025, 1, 1, tzinfo=datetime.timezone.utc)
+HISTORY_DAYS = 3 * 365
+
+DEPARTMENTS = {
+    'Electronics': {
+        'nouns': ['Phone', 'Laptop', 'Tablet', 'Headphones', 'Speaker', 'Monitor', 'Camera', 'Smartwatch'],
+        'tags': ['wireless', 'bluetooth', 'usb-c', '4k', 'noise cancelling', 'fast charging', 'oled', 'smart'],
+        'specs': {'color': ['Black', 'Silver', 'White', 'Blue'], 'warranty': ['1 year', '2 years'],
+                  'connectivity': ['Bluetooth 5.3', 'Wi-Fi 6', 'USB-C']},
+        'price': 300,
+    },
+    'Clothing': {
+        'nouns': ['T-Shirt', 'Jacket', 'Jeans', 'Hoodie', 'Dress', 'Sweater', 'Shorts', 'Coat'],
+        'tags': ['cotton', 'slim fit', 'organic', 'waterproof', 'casual', 'winter', 'summer', 'unisex'],
+        'specs': {'size': ['XS', 'S', 'M', 'L', 'XL'], 'material': ['Cotton', 'Polyester', 'Wool', 'Linen'],
+                  'color': ['Black', 'Navy', 'Grey', 'Red', 'Green']},
+        'price': 40,
+    },
+    'Books': {
+        'nouns': ['Novel', 'Cookbook', 'Guide', 'Biography', 'Atlas', 'Anthology', 'Handbook', 'Memoir'],
+        'tags': ['bestseller', 'hardcover', 'paperback', 'fiction', 'non-fiction', 'illustrated', 'classic'],
+        'specs': {'format': ['Hardcover', 'Paperback', 'E-book'], 'language': ['English', 'Spanish', 'German'],
+                  'pages': ['120', '240', '380', '560']},
+        'price': 18,
+    },
+    'Home & Garden': {
+        'nouns': ['Lamp', 'Chair', 'Planter', 'Rug', 'Blender', 'Kettle', 'Shelf', 'Hose'],
+        'tags': ['eco', 'handmade', 'stainless steel', 'outdoor', 'indoor', 'modern', 'compact'],
+        'specs': {'material': ['Wood', 'Steel', 'Ceramic', 'Plastic'], 'color': ['White', 'Oak', 'Black'],
+                  'assembly': ['Required', 'Not required']},
+        'price': 60,
+    },
+    'Sports': {
+        'nouns': ['Running Shoes', 'Yoga Mat', 'Dumbbells', 'Bike Helmet', 'Tent', 'Backpack', 'Racket', 'Ball'],
+        'tags': ['running', 'training', 'lightweight', 'breathable', 'outdoor', 'trail', 'gym'],
+        'specs': {'size': ['S', 'M', 'L'], 'weight': ['250 g', '500 g', '1 kg', '5 kg'],
+                  'material': ['Nylon', 'Rubber', 'Mesh', 'Carbon']},
+        'price': 70,
+    },
+}
+COMMON_TAGS = ['sale', 'new', 'popular', 'gift', 'premium', 'budget', 'limited edition', 'eco friendly']
+ADJECTIVES = ['Ultra', 'Pro', 'Classic', 'Smart', 'Compact', 'Deluxe', 'Essential', 'Advanced',
+              'Lite', 'Max', 'Urban', 'Active', 'Prime', 'Nova', 'Edge', 'Flex']
+SYLLABLES = ['zen', 'ko', 'vo', 'lux', 'tri', 'ax', 'mo', 'ra', 'ven', 'qi', 'sol', 'ter', 'na', 'dex']
+FIRST_NAMES = ['Alex', 'Sam', 'Jordan', 'Taylor', 'Morgan', 'Casey', 'Riley', 'Jamie', 'Avery', 'Quinn']
+REVIEW_TITLES = {
+    1: ['Very disappointed', 'Broke quickly', 'Not as described'],
+    2: ['Below expectations', 'Not great', 'Meh'],
+    3: ['It is okay', 'Average', 'Does the job'],
+    4: ['Really good', 'Happy with it', 'Solid choice'],
+    5: ['Excellent!', 'Love it', 'Best purchase this year'],
+}
+CENT = Decimal('0.01')
+# J-shaped star distribution (index 0 = 1 star)
+STAR_WEIGHTS = [8, 5, 9, 23, 55]
+
+
+def zipf_weights(count, exponent=1.1):
+    """Cumulative Zipf weights for rank 1..count, for random.choices(cum_weights=)"""
+    total = 0.0
+    cumulative = []
+    for rank in range(1, count + 1):
+        total += 1 / rank ** exponent
+        cumulative.append(total)
+    return cumulative
+
+
+def category_names(count):
+    """Department names first, then numbered sub-departments"""
+    names = list(DEPARTMENTS)
+    for index in range(len(names), count):
+        names.append(f'{names[index % len(DEPARTMENTS)]} {index // len(DEPARTMENTS) + 1}')
+    return names[:count]
+
+
+def department(category_name):
+    """Vocabulary of the department a (possibly numbered) category belongs to"""
+    for name, vocabulary in DEPARTMENTS.items():
+        if category_name.startswith(name):
+            return vocabulary
+    return DEPARTMENTS['Electronics']
+
+
+def brand_names(count, seed):
+    rng = random.Random(f'{seed}:brands')
+    names = set()
+    while len(names) < count:
+        name = ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3))).capitalize()
+        names.add(f'{name} {len(names)}' if name in names else name)
+    return sorted(names)
+
+
+def all_tags():
+    tags = set(COMMON_TAGS)
+    for vocabulary in DEPARTMENTS.values():
+        tags.update(vocabulary['tags'])
+    return sorted(tags)
+
+
+def _uuid(rng):
+    return uuid.UUID(int=rng.getrandbits(128), version=4)
+
+
+def _review_count(rng, mean):
+    """Heavy-tailed review count with the given mean (log-normal, sigma 1.5)"""
+    if mean <= 0:
+        return 0
+    sigma = 1.5
+    mu = math.log(mean) - sigma ** 2 / 2
+    return int(rng.lognormvariate(mu, sigma))
+
+
+def generate_chunk(seed, chunk, size, categories, brands, avg_reviews):
+    """
+    Generate `size` products with their reviews.
+
+    `categories` / `brands` are (ids, names, cumulative Zipf weights)
+    triples. Returns (products, reviews) as lists of attribute dicts whose
+    rating aggregates already match the generated reviews.
+    """
+    rng = random.Random(f'{seed}:{chunk}')
+    category_ids, category_labels, category_weights = categories
+    brand_ids, brand_labels, brand_weights = brands
+    history = datetime.timedelta(days=HISTORY_DAYS)
+    products, reviews = [], []
+
+    for _ in range(size):
+        category_index = rng.choices(range(len(category_ids)), cum_weights=category_weights)[0]
+        brand_index = rng.choices(range(len(brand_ids)), cum_weights=brand_weights)[0]
+        vocabulary = department(category_labels[category_index])
+        noun = rng.choice(vocabulary['nouns'])
+        name = f'{brand_labels[brand_index]} {rng.choice(ADJECTIVES)} {noun} {rng.randint(1, 999)}'
+
+        price = max(Decimal(str(round(rng.lognormvariate(math.log(vocabulary['price']), 0.6), 2))), Decimal('0.99'))
+        original_price = None
+        if rng.random() < 0.2:
+            original_price = (price * Decimal(str(round(rng.uniform(1.1, 1.6), 2)))).quantize(CENT)
+
+        tags = rng.sample(vocabulary['tags'], rng.randint(1, 3))
+        if rng.random() < 0.4:
+            tags.append(rng.choice(COMMON_TAGS))
+        specifications = {key: rng.choice(values) for key, values in vocabulary['specs'].items()}
+
+        created_at = END_DATE - history * rng.random() ** 0.7
+        stock_quantity = 0 if rng.random() < 0.1 else int(rng.expovariate(1 / 40))
+        product_id = _uuid(rng)
+
+        # Per-product quality shifts the star distribution
+        quality = rng.uniform(-1, 1)
+        star_weights = [max(w * (1 + quality * (star - 3) / 2), 0.5) for star, w in enumerate(STAR_WEIGHTS, 1)]
+        histogram = [0] * 5
+        for _ in range(_review_count(rng, avg_reviews)):
+            rating = rng.choices(range(1, 6), weights=star_weights)[0]
+            histogram[rating - 1] += 1
+            reviewed_at = created_at + (END_DATE - created_at) * rng.random()
+            reviews.append({
+                'id': _uuid(rng),
+                'product_id': product_id,
+                'user_name': f'{rng.choice(FIRST_NAMES)} {rng.choice(SYLLABLES).capitalize()}.',
+                'user_email': f'user{rng.randrange(10 ** 7)}@example.com',
+                'rating': rating,
+                'title': rng.choice(REVIEW_TITLES[rating]),
+                'comment': f'{rng.choice(REVIEW_TITLES[rating])}. {noun} review.',
+                'helpful_count': int(rng.paretovariate(1.5)) - 1,
+                'verified_purchase': rng.random() < 0.7,
+                'created_at': reviewed_at,
+                'updated_at': reviewed_at,
+            })
+
+        review_count = sum(histogram)
+        rating_sum = sum(star * count for star, count in enumerate(histogram, 1))
+        products.append({
+            'id': product_id,
+            'name': name,
+            'sku': f'SYN-{product_id.hex[:16].upper()}',
+            'description': f'{name}: {", ".join(tags)}. ' + ' '.join(f'{k} {v}.' for k, v in specifications.items()),
+            'price': price,
+            'original_price': original_price,
+            'category_id': category_ids[category_index],
+            'subcategory': noun,
+            'brand_id': brand_ids[brand_index],
+            'in_stock': stock_quantity > 0,
+            'stock_quantity': stock_quantity,
+            # Rounded like ratings.apply_delta
+            'rating': (Decimal(rating_sum) / review_count).quantize(CENT, ROUND_HALF_UP) if review_count else Decimal('0.00'),
+            'review_count': review_count,
+            'rating_sum': rating_sum,
+            **{f'rating_{star}_count': histogram[star - 1] for star in range(1, 6)},
+            'tags': tags,
+            'specifications': specifications,
+            'thumbnail': '',
+            'thumbnail_url': None,
+            'thumbnail_variants': {},
+            'created_at': created_at,
+            'updated_at': created_at,
+        })
+    return products, reviews
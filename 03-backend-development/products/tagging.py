@@ -0,0 +1,126 @@
+"""
+Normalized tag index.
+
+`Product.tags` stays the JSON source of truth (it is what clients read
+and write), while `Tag`/`ProductTag` hold a normalized copy that can be
+filtered through indexed joins instead of substring-matching serialized
+JSON. `sync_product_tags` runs on every product save.
+"""
+from django.db.models import Count
+
+from .models import ProductTag, Tag
+
+MAX_TAG_LENGTH = Tag._meta.get_field('name').max_length
+
+# Query parameters understood by filter_by_tags
+TAG_PARAMS = ('tag', 'tag_prefix', 'tags_any', 'tags_all')
+
+
+def normalize_tag(value):
+    """Lowercase, collapse whitespace and trim a tag; '' when empty"""
+    return ' '.join(str(value).lower().split())[:MAX_TAG_LENGTH]
+
+
+def normalize_tags(values):
+    """Normalized, de-duplicated tag names from a JSON tags value"""
+    if not isinstance(values, (list, tuple)):
+        values = [values] if values else []
+    names = {normalize_tag(value) for value in values}
+    names.discard('')
+    return names
+
+
+def parse_tag_list(value):
+    """Split a comma separated query parameter into normalized tag names"""
+    return normalize_tags(value.split(',')) if value else set()
+
+
+def get_tag_ids(names):
+    """Map tag names to ids, creating missing tags"""
+    existing = dict(Tag.objects.filter(name__in=names).values_list('name', 'id'))
+    missing = names - existing.keys()
+    if missing:
+        Tag.objects.bulk_create([Tag(name=name) for name in missing], ignore_conflicts=True)
+        existing.update(Tag.objects.filter(name__in=missing).values_list('name', 'id'))
+    return existing
+
+
+def sync_product_tags(product):
+    """Make the product's ProductTag rows match its JSON tags"""
+    sync_tags({product.pk: product.tags})
+
+
+def sync_tags(tags_by_product):
+    """
+    Make ProductTag rows match the JSON tags of many products at once.
+
+    `tags_by_product` maps product id to its JSON tags value. Uses a fixed
+    number of queries regardless of how many products are passed.
+    """
+    wanted = {
+        product_id: normalize_tags(tags) for product_id, tags in tags_by_product.items()
+    }
+    current = {}
+    links = ProductTag.objects.filter(product_id__in=wanted).values_list(
+        'product_id', 'tag__name', 'id'
+    )
+    for product_id, name, link_id in links:
+        current.setdefault(product_id, {})[name] = link_id
+
+    stale = []
+    added = []
+    for product_id, names in wanted.items():
+        existing = current.get(product_id, {})
+        stale += [link_id for name, link_id in existing.items() if name not in names]
+        added += [(product_id, name) for name in names - existing.keys()]
+
+    if stale:
+        ProductTag.objects.filter(id__in=stale).delete()
+    if added:
+        tag_ids = get_tag_ids({name for _, name in added})
+        ProductTag.objects.bulk_create(
+            [ProductTag(product_id=product_id, tag_id=tag_ids[name]) for product_id, name in added],
+            ignore_conflicts=True,
+        )
+
+
+def _products_with_tags(**lookups):
+    return ProductTag.objects.filter(**lookups).values('product_id')
+
+
+def filter_by_tags(products, params):
+    """
+    Apply tag filters to a product queryset.
+
+    - ``tag``: exact tag
+    - ``tag_prefix``: tags starting with the given text
+    - ``tags_any``: comma separated, product has at least one of them
+    - ``tags_all``: comma separated, product has every one of them
+    """
+    tag = normalize_tag(params.get('tag', ''))
+    if tag:
+        products = products.filter(id__in=_products_with_tags(tag__name=tag))
+
+    prefix = normalize_tag(params.get('tag_prefix', ''))
+    if prefix:
+        # A range instead of LIKE 'prefix%' so SQLite can use the unique
+        # index on Tag.name (names are stored lowercase)
+        products = products.filter(id__in=_products_with_tags(
+            tag__name__gte=prefix, tag__name__lt=prefix + '\uffff'
+        ))
+
+    any_of = parse_tag_list(params.get('tags_any'))
+    if any_of:
+        products = products.filter(id__in=_products_with_tags(tag__name__in=any_of))
+
+    all_of = parse_tag_list(params.get('tags_all'))
+    if all_of:
+        matching = (
+            _products_with_tags(tag__name__in=all_of)
+            .annotate(matched=Count('tag_id'))
+            .filter(matched=len(all_of))
+            .values('product_id')
+        )
+        products = products.filter(id__in=matching)
+
+    return products
@@ -3,7 +3,7 @@ URL configuration for products app.
 Defines API endpoints for e-commerce product management.
 """
 from django.urls import path
-from . import views
+from . import async_views, views
 
 # URL patterns
 urlpatterns = [
@@ -23,11 +23,24 @@ urlpatterns = [
     
     # Product endpoints
     path('products/', views.ProductListView.as_view(), name='product-list'),
+    path('products/batch/', views.product_batch, name='product-batch'),
     path('products/<uuid:pk>/', views.ProductDetailView.as_view(), name='product-detail'),
     path('products/<uuid:product_id>/reviews/', views.ProductReviewsView.as_view(), name='product-reviews'),
     
     # Search endpoint
     path('search/', views.product_search, name='product-search'),
+
+    # Facet counts for the filter sidebar
+    path('facets/', views.ProductFacetsView.as_view(), name='product-facets'),
+
+    # Streaming NDJSON export of the whole (filtered) catalog
+    path('export/', views.product_export, name='product-export'),
+
+    # Async (ASGI) variants of the read endpoints
+    path('async/', async_views.api_overview, name='async-api-overview'),
+    path('async/products/', async_views.product_list, name='async-product-list'),
+    path('async/products/<uuid:pk>/', async_views.product_detail, name='async-product-detail'),
+    path('async/search/', async_views.product_search, name='async-product-search'),
 ]
 
 # This creates the following endpoints:
@@ -38,5 +51,10 @@ urlpatterns = [
 # GET /api/brands/{id}/ - Get specific brand, PUT/PATCH - Update, DELETE - Delete
 # GET /api/products/ - List all products (with filtering), POST - Create new product
 # GET /api/products/{id}/ - Get specific product, PUT/PATCH - Update, DELETE - Delete
+# GET /api/products/batch/?ids=... - Several products by id in one query, POST {"ids": [...]} for long lists
 # GET /api/products/{id}/reviews/ - List reviews for product, POST - Create new review
 # GET /api/search/ - Advanced product search with multiple filters
+# GET /api/facets/ - Facet counts (categories, brands, price, rating, stock) for a filter set
+# GET /api/export/ - Streaming NDJSON export of the catalog, same filters as search
+# GET /api/async/, /api/async/products/, /api/async/products/{id}/, /api/async/search/ -
+#     async versions of the overview, product list/detail and search (serve with ASGI)
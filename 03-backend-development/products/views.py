@@ -1,56 +1,106 @@
+import uuid
+
 from rest_framework import generics, filters, status
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Q
-from .models import Category, Brand, Product, Review
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from django.views.decorators.http import require_GET
+from django.db.models import Count, Max, OuterRef, Subquery, Sum, TextField
+from django.db.models.functions import Cast, Length
+from .models import Category, Brand, Product, ProductImage, Review
+from . import counting, exporting, fieldsets
+from .caching import CachedResponseMixin
+from .conditional import ConditionalGetMixin
+from .facets import compute_facets
+from .filtering import filter_products
+from .tagging import filter_by_tags
+from .pagination import (
+    IndexOrderingFilter, ProductPagination, paginate_keyset, parse_page_params, wants_cursor,
+)
 from .serializers import (
-    CategorySerializer, BrandSerializer, ProductListSerializer,
-    ProductDetailSerializer, ProductCreateUpdateSerializer, ReviewSerializer
+    CategorySerializer, BrandSerializer, ProductListSerializer, FastProductListSerializer,
+    ProductDetailSerializer, ProductCreateUpdateSerializer, ReviewSerializer,
+    top_reviews_prefetch,
 )
 
 
-class CategoryListView(generics.ListCreateAPIView):
+def get_list_serializer_class():
+    """Serializer for product list/search rows (PRODUCTS_FAST_LIST_SERIALIZATION)"""
+    if getattr(settings, 'PRODUCTS_FAST_LIST_SERIALIZATION', True):
+        return FastProductListSerializer
+    return ProductListSerializer
+
+
+def get_list_rows(queryset, serializer_class, fields=None):
+    """
+    Queryset in the shape `serializer_class` consumes, loading only the
+    columns read by `fields` when given (sparse fieldsets)
+    """
+    if serializer_class is FastProductListSerializer:
+        return serializer_class.get_rows(queryset, fields)
+    if fields is not None:
+        return fieldsets.restrict_queryset(queryset, serializer_class, fields)
+    return queryset
+
+
+class CategoryListView(CachedResponseMixin, ConditionalGetMixin, generics.ListCreateAPIView):
     """List all categories or create a new category"""
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     filter_backends = [filters.SearchFilter]
     search_fields = ['name']
+    cache_dependencies = ('category',)
 
 
-class CategoryDetailView(generics.RetrieveUpdateDestroyAPIView):
+class CategoryDetailView(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     """Retrieve, update or delete a category"""
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
 
 
-class BrandListView(generics.ListCreateAPIView):
+class BrandListView(CachedResponseMixin, ConditionalGetMixin, generics.ListCreateAPIView):
     """List all brands or create a new brand"""
     queryset = Brand.objects.all()
     serializer_class = BrandSerializer
     filter_backends = [filters.SearchFilter]
     search_fields = ['name']
+    cache_dependencies = ('brand',)
 
 
-class BrandDetailView(generics.RetrieveUpdateDestroyAPIView):
+class BrandDetailView(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     """Retrieve, update or delete a brand"""
     queryset = Brand.objects.all()
     serializer_class = BrandSerializer
 
 
-class ProductListView(generics.ListCreateAPIView):
+class ProductListView(CachedResponseMixin, ConditionalGetMixin, fieldsets.SparseFieldsViewMixin,
+                      generics.ListCreateAPIView):
     """List all products with filtering and search capabilities"""
     queryset = Product.objects.all()
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    search_fields = ['name', 'description', 'tags']
+    # '=' makes tag search an exact match on the normalized tag index
+    search_fields = ['name', 'description', '=tag_index__name']
     filterset_fields = ['category', 'brand', 'in_stock']
     ordering_fields = ['price', 'rating', 'created_at', 'name']
     ordering = ['-created_at']
+    pagination_class = ProductPagination
+    cache_dependencies = ('product', 'category', 'brand')
+    # List rows embed category and brand names
+    validator_fields = ('updated_at', 'category__updated_at', 'brand__updated_at')
 
     def get_serializer_class(self):
         if self.request.method == 'POST':
             return ProductCreateUpdateSerializer
-        return ProductListSerializer
+        return get_list_serializer_class()
+
+    def paginate_queryset(self, queryset):
+        # Paginate plain rows when the fast serializer is in use
+        return super().paginate_queryset(
+            get_list_rows(queryset, self.get_serializer_class(), self.sparse_fields)
+        )
 
     def get_queryset(self):
         queryset = Product.objects.select_related('category', 'brand')
@@ -67,12 +117,41 @@ class ProductListView(generics.ListCreateAPIView):
         if min_rating:
             queryset = queryset.filter(rating__gte=min_rating)
             
-        return queryset
+        return filter_by_tags(queryset, self.request.query_params)
 
 
-class ProductDetailView(generics.RetrieveUpdateDestroyAPIView):
+class ProductDetailView(CachedResponseMixin, ConditionalGetMixin, fieldsets.SparseFieldsViewMixin,
+                        generics.RetrieveUpdateDestroyAPIView):
     """Retrieve, update or delete a product"""
-    queryset = Product.objects.select_related('category', 'brand').prefetch_related('images', 'reviews')
+    queryset = Product.objects.select_related('category', 'brand').prefetch_related('images')
+    cache_dependencies = ('product', 'category', 'brand', 'productimage', 'review')
+
+    def get_queryset(self):
+        # Only the top reviews are embedded; built per request so the limit
+        # setting is read at request time
+        queryset = super().get_queryset().prefetch_related(top_reviews_prefetch())
+        if self.sparse_fields is not None:
+            queryset = fieldsets.restrict_queryset(queryset, ProductDetailSerializer, self.sparse_fields)
+        return queryset
+
+    def get_validator_values(self):
+        # Reviews and images are embedded too; per-relation subqueries avoid
+        # the reviews x images row explosion of joining both at once
+        reviews = Review.objects.filter(product=OuterRef('pk')).order_by().values('product')
+        images = ProductImage.objects.filter(product=OuterRef('pk')).order_by().values('product')
+        return Product.objects.filter(pk=self.kwargs['pk']).values(
+            'updated_at', 'category__updated_at', 'brand__updated_at',
+        ).annotate(
+            reviews_updated_at=Subquery(reviews.annotate(last=Max('updated_at')).values('last')),
+            reviews_total=Subquery(reviews.annotate(total=Count('pk')).values('total')),
+            images_created_at=Subquery(images.annotate(last=Max('created_at')).values('last')),
+            images_total=Subquery(images.annotate(total=Count('pk')).values('total')),
+            # ProductImage has no updated_at: its variants (hence *_srcset)
+            # change the size of the stored JSON when they are generated
+            images_variants=Subquery(images.annotate(
+                size=Sum(Length(Cast('image_variants', TextField())))
+            ).values('size')),
+        ).first()
     
     def get_serializer_class(self):
         if self.request.method in ['PUT', 'PATCH']:
@@ -83,6 +162,13 @@ class ProductDetailView(generics.RetrieveUpdateDestroyAPIView):
 class ProductReviewsView(generics.ListCreateAPIView):
     """List reviews for a specific product or create a new review"""
     serializer_class = ReviewSerializer
+    pagination_class = ProductPagination
+    filter_backends = [IndexOrderingFilter]
+    # Both orderings are served by the (product, ...) indexes on Review;
+    # helpful_count ties are broken by created_at, as in its index
+    ordering_fields = ['created_at', 'helpful_count']
+    ordering_tie_breakers = {'helpful_count': ('created_at',)}
+    ordering = ['-created_at']
     
     def get_queryset(self):
         product_id = self.kwargs['product_id']
@@ -96,66 +182,160 @@ class ProductReviewsView(generics.ListCreateAPIView):
 @api_view(['GET'])
 def product_search(request):
     """Advanced product search endpoint"""
-    query = request.GET.get('q', '')
-    category_id = request.GET.get('category')
-    brand_id = request.GET.get('brand')
-    min_price = request.GET.get('min_price')
-    max_price = request.GET.get('max_price')
-    min_rating = request.GET.get('min_rating')
-    in_stock = request.GET.get('in_stock')
-    
-    products = Product.objects.select_related('category', 'brand')
-    
-    if query:
-        # For SQLite compatibility, we'll search in name and description only
-        # and use a simpler approach for tags
-        products = products.filter(
-            Q(name__icontains=query) |
-            Q(description__icontains=query) |
-            Q(tags__icontains=query)  # This works with SQLite as a simple string search
-        )
-    
-    if category_id:
-        products = products.filter(category_id=category_id)
-    
-    if brand_id:
-        products = products.filter(brand_id=brand_id)
-    
-    if min_price:
-        products = products.filter(price__gte=min_price)
-    
-    if max_price:
-        products = products.filter(price__lte=max_price)
-    
-    if min_rating:
-        products = products.filter(rating__gte=min_rating)
-    
-    if in_stock is not None:
-        products = products.filter(in_stock=in_stock.lower() == 'true')
+    products = filter_products(Product.objects.select_related('category', 'brand'), request.GET)
     
     # Order by relevance (simplified)
     products = products.order_by('-rating', '-created_at')
+    list_serializer_class = get_list_serializer_class()
+    fields = fieldsets.requested_fields(request.GET, fieldsets.field_names(list_serializer_class))
+    rows = get_list_rows(products, list_serializer_class, fields)
     
     # Pagination
-    page_size = int(request.GET.get('page_size', 20))
-    page = int(request.GET.get('page', 1))
+    try:
+        page, page_size = parse_page_params(request.GET)
+    except ValueError as exc:
+        return Response({
+            'error': 'Invalid page',
+            'details': str(exc)
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    # How the total is obtained: exact COUNT(*), cached or estimated
+    count_strategy = request.GET.get(counting.COUNT_PARAM, counting.EXACT)
+    if count_strategy not in counting.COUNT_STRATEGIES:
+        return Response({
+            'error': 'Invalid count strategy',
+            'details': f"Choose one of: {', '.join(counting.COUNT_STRATEGIES)}"
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    if wants_cursor(request.GET):
+        # Keyset mode: seek past the cursor instead of OFFSET scanning
+        keyset_page = paginate_keyset(rows, request.GET.get('cursor'), page_size)
+        serializer = list_serializer_class(keyset_page.results, many=True, fields=fields)
+        data = {
+            'count': counting.get_count(products, request.GET, count_strategy),
+            'count_strategy': count_strategy,
+            'page_size': page_size,
+            'next_cursor': keyset_page.next_cursor,
+            'previous_cursor': keyset_page.previous_cursor,
+            'results': serializer.data
+        }
+        if count_strategy == counting.ESTIMATED:
+            data['has_more'] = keyset_page.next_cursor is not None
+        return Response(data)
+
     start = (page - 1) * page_size
     end = start + page_size
     
-    total_count = products.count()
-    products_page = products[start:end]
+    has_more = None
+    if count_strategy == counting.ESTIMATED:
+        # Read one extra row instead of counting; the total is a lower bound
+        page_rows = list(rows[start:end + 1])
+        has_more = len(page_rows) > page_size
+        products_page = page_rows[:page_size]
+        total_count = counting.estimated_total(start, len(products_page), has_more)
+    else:
+        total_count = counting.get_count(products, request.GET, count_strategy)
+        products_page = rows[start:end]
     
-    serializer = ProductListSerializer(products_page, many=True)
+    serializer = list_serializer_class(products_page, many=True, fields=fields)
     
-    return Response({
+    data = {
         'count': total_count,
+        'count_strategy': count_strategy,
         'page': page,
         'page_size': page_size,
-        'total_pages': (total_count + page_size - 1) // page_size,
+        'total_pages': (total_count + page_size - 1) // page_size if total_count is not None else None,
         'results': serializer.data
+    }
+    if has_more is not None:
+        data['has_more'] = has_more
+    return Response(data)
+
+
+def parse_batch_ids(request):
+    """Requested product ids, in order and without duplicates; raises ValueError"""
+    if request.method == 'POST':
+        ids = request.data.get('ids') if isinstance(request.data, dict) else None
+        if not isinstance(ids, list):
+            raise ValueError('Send a JSON object with an "ids" list')
+    else:
+        ids = [value for value in request.GET.get('ids', '').split(',') if value.strip()]
+    if not ids:
+        raise ValueError('No product ids given')
+    limit = getattr(settings, 'PRODUCTS_BATCH_MAX_IDS', 250)
+    if len(ids) > limit:
+        raise ValueError(f'At most {limit} ids per request')
+    parsed = {}
+    for value in ids:
+        try:
+            parsed.setdefault(uuid.UUID(str(value).strip()), None)
+        except ValueError:
+            raise ValueError(f'{value!r} is not a valid product id') from None
+    return list(parsed)
+
+
+@api_view(['GET', 'POST'])
+def product_batch(request):
+    """
+    Several products by id in one query (cart, wishlist, recommendations).
+
+    Results follow the requested order; ids without a product are listed
+    under `missing`. POST {"ids": [...]} for lists too long for a URL.
+    """
+    try:
+        ids = parse_batch_ids(request)
+    except ValueError as exc:
+        return Response({
+            'error': 'Invalid product ids',
+            'details': str(exc)
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    list_serializer_class = get_list_serializer_class()
+    fields = fieldsets.requested_fields(request.GET, fieldsets.field_names(list_serializer_class))
+    products = Product.objects.select_related('category', 'brand').filter(id__in=ids).order_by()
+    rows = list(get_list_rows(products, list_serializer_class, fields))
+    data = list_serializer_class(rows, many=True, context={'request': request}, fields=fields).data
+    # Matched through the rows: `id` may not be among the fields
+    found = {row['id'] if isinstance(row, dict) else row.pk: item for row, item in zip(rows, data)}
+    results = [found[pk] for pk in ids if pk in found]
+    return Response({
+        'count': len(results),
+        'results': results,
+        'missing': [str(pk) for pk in ids if pk not in found],
     })
 
 
+class ProductFacetsView(CachedResponseMixin, generics.RetrieveAPIView):
+    """Facet counts for the filter sidebar, accepting the same filters as search"""
+    cache_dependencies = ('product', 'category', 'brand')
+
+    def get_cache_timeout(self):
+        # PRODUCTS_FACETS_CACHE_TIMEOUT = 0 disables the facet cache
+        return getattr(settings, 'PRODUCTS_FACETS_CACHE_TIMEOUT', super().get_cache_timeout())
+
+    def get_queryset(self):
+        return filter_products(Product.objects.all(), self.request.query_params)
+
+    def retrieve(self, request, *args, **kwargs):
+        return Response(compute_facets(self.get_queryset()))
+
+
+@require_GET
+def product_export(request):
+    """Stream the (filtered) catalog as NDJSON, gzip compressed when accepted"""
+    # Plain Django view: DRF content negotiation has no NDJSON renderer
+    compress = exporting.accepts_gzip(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    chunks = exporting.export_products(
+        request.GET, context={'request': request}, compress=compress
+    )
+    response = StreamingHttpResponse(chunks, content_type=exporting.NDJSON_CONTENT_TYPE)
+    response['Content-Disposition'] = 'attachment; filename="products.ndjson"'
+    if compress:
+        response['Content-Encoding'] = 'gzip'
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+
 @api_view(['GET'])
 def api_overview(request):
     """API overview and available endpoints"""
@@ -168,7 +348,12 @@ def api_overview(request):
         'Products': '/api/products/',
         'Product Detail': '/api/products/<uuid:id>/',
         'Product Reviews': '/api/products/<uuid:product_id>/reviews/',
+        'Product Batch': '/api/products/batch/?ids=<id>,<id>,...',
         'Product Search': '/api/search/?q=<query>&category=<id>&brand=<id>&min_price=<price>&max_price=<price>&min_rating=<rating>&in_stock=<true/false>',
+        'Product Facets': '/api/facets/?q=<query>&category=<id>&brand=<id>&min_price=<price>&max_price=<price>&min_rating=<rating>&in_stock=<true/false>',
+        'Product Export': '/api/export/?q=<query>&category=<id>&brand=<id>&min_price=<price>&max_price=<price>&min_rating=<rating>&in_stock=<true/false>',
+        'Async API': '/api/async/',
+        'Metrics': '/metrics',
         'Admin Panel': '/admin/',
     }
     